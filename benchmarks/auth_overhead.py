@@ -0,0 +1,97 @@
+"""Compares the per-request cost of resolving the current user before and after
+the auth context cache.
+
+"before" replays the old path: the access token verified twice with
+`jwt.decode`, bypassing the token cache, the blocklist check and a full User
+row load. "after" is the current path: one decode, the
+local revocation check and UserService.getAuthUser. Run from the project root against
+a database holding the given user:
+
+    python -m benchmarks.auth_overhead --email user@example.com --requests 2000
+"""
+import argparse
+import asyncio
+import time
+
+import jwt
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.stats import report
+from src.auth.revocation import revocationList
+from src.auth.service import UserService, authUserCache
+from src.auth.utils import createAccessToken, decodeToken
+from src.config import Config
+from src.db.main import asyncEngine
+from src.db.models import User
+from src.db.redis import redisClient, tokenInBlocklist
+
+userService = UserService()
+
+
+def verifyToken(token: str) -> dict:
+    return jwt.decode(jwt=token, key=Config.JWT_SECRET, algorithms=[Config.JWT_ALGORITHM])
+
+
+async def before(token: str, session: AsyncSession) -> None:
+    tokenData = verifyToken(token)
+    verifyToken(token)
+    await tokenInBlocklist(tokenData["jti"])
+
+    statement = select(User).where(User.email == tokenData["user"]["email"])
+    result = await session.exec(statement)
+    result.first()
+
+
+async def after(token: str, session: AsyncSession) -> None:
+    tokenData = decodeToken(token)
+    await revocationList.isRevoked(tokenData["jti"])
+
+    await userService.getAuthUser(tokenData["user"]["email"], session)
+
+
+async def measure(name: str, resolve, token: str, requests: int) -> None:
+    samples = []
+
+    async with AsyncSession(asyncEngine, expire_on_commit=False) as session:
+        for _ in range(requests):
+            startTime = time.perf_counter()
+            await resolve(token, session)
+            samples.append((time.perf_counter() - startTime) * 1000)
+
+    print(f"{name}: {requests} requests")
+    report(samples)
+
+
+async def main(args) -> None:
+    async with AsyncSession(asyncEngine) as session:
+        user = await userService.getUserByEmail(args.email, session)
+
+    if user is None:
+        raise SystemExit(f"no user with email {args.email}")
+
+    token = createAccessToken(
+        userData={"email": user.email, "userUid": str(user.uid), "role": user.role}
+    )
+
+    await measure("before", before, token, args.requests)
+
+    await revocationList.start()
+    while not revocationList.isCurrent():
+        await asyncio.sleep(0.1)
+
+    await userService.invalidateAuthUser(args.email)
+    await measure("after", after, token, args.requests)
+
+    await revocationList.stop()
+    authUserCache.clear()
+    await asyncEngine.dispose()
+    await redisClient.aclose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--requests", type=int, default=2000)
+
+    asyncio.run(main(parser.parse_args()))
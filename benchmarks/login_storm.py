@@ -0,0 +1,94 @@
+"""Fires a storm of concurrent logins at a running server and measures the
+latency of another endpoint while it lasts.
+
+The probe endpoint is timed once with the server idle and once during the
+storm; with bcrypt off the event loop the two should stay close. Every login
+comes from one address for one email, so the server has to run with the login
+rate limits off or the storm never reaches bcrypt. Run from the project root
+against a server started with `RATE_LIMIT_ENABLED=false fastapi run src`,
+using the credentials of an existing, verified user:
+
+    python -m benchmarks.login_storm --email user@example.com --password secret
+"""
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from benchmarks.stats import report
+
+
+async def probe(client: httpx.AsyncClient, path: str, stop: asyncio.Event) -> list:
+    samples = []
+
+    while not stop.is_set():
+        startTime = time.perf_counter()
+        await client.get(path)
+        samples.append((time.perf_counter() - startTime) * 1000)
+        await asyncio.sleep(0.01)
+
+    return samples
+
+
+async def login(client: httpx.AsyncClient, credentials: dict, count: int, results: dict):
+    for _ in range(count):
+        response = await client.post("/api/0.1/auth/login", json=credentials)
+        results[response.status_code] = results.get(response.status_code, 0) + 1
+
+
+async def main(args) -> None:
+    credentials = {"email": args.email, "password": args.password}
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+
+    async with httpx.AsyncClient(
+        base_url=args.base_url, limits=limits, timeout=60
+    ) as client:
+        stop = asyncio.Event()
+        probeTask = asyncio.create_task(probe(client, args.probe_path, stop))
+        await asyncio.sleep(args.idle_seconds)
+        stop.set()
+        idleSamples = await probeTask
+
+        stop = asyncio.Event()
+        results = {}
+        probeTask = asyncio.create_task(probe(client, args.probe_path, stop))
+
+        startTime = time.perf_counter()
+        await asyncio.gather(
+            *(
+                login(client, credentials, args.logins // args.concurrency, results)
+                for _ in range(args.concurrency)
+            )
+        )
+        elapsed = time.perf_counter() - startTime
+
+        stop.set()
+        stormSamples = await probeTask
+
+    total = sum(results.values())
+    print(f"logins: {total} in {elapsed:.1f} s ({total / elapsed:.1f}/s)")
+    print("status codes: " + ", ".join(f"{k}={v}" for k, v in sorted(results.items())))
+
+    if results.get(429):
+        print(
+            "warning: logins were rate limited and skipped bcrypt; "
+            "restart the server with RATE_LIMIT_ENABLED=false"
+        )
+    print(f"\n{args.probe_path} while idle")
+    report(idleSamples)
+    print(f"\n{args.probe_path} during login storm")
+    report(stormSamples)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--probe-path", default="/api/0.1/openapi.json")
+    parser.add_argument("--idle-seconds", type=float, default=5)
+
+    asyncio.run(main(parser.parse_args()))
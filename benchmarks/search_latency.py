@@ -0,0 +1,105 @@
+"""Seeds the configured Postgres with synthetic books and measures the latency
+of BookService.searchBooks.
+
+Run from the project root against a migrated, disposable database:
+
+    python -m benchmarks.search_latency --rows 2000000 --queries 500
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from sqlalchemy import text
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from benchmarks.stats import report
+from src.books.service import BookService
+from src.db.main import asyncEngine
+
+WORDS = [
+    "shadow", "river", "empire", "garden", "winter", "silent", "crown", "storm",
+    "glass", "harbor", "machine", "forest", "letters", "fire", "orchard", "night",
+    "stone", "island", "mirror", "kingdom", "ocean", "memory", "city", "wolf",
+    "engine", "lantern", "desert", "archive", "north", "bridge", "summer", "ghost",
+]
+
+SEED_MARKER = "bench-search"
+
+bookService = BookService()
+
+
+async def seed(rows: int) -> None:
+    words = "ARRAY[" + ", ".join(f"'{word}'" for word in WORDS) + "]"
+    pick = f"({words})[1 + floor(random() * {len(WORDS)})::int]"
+
+    async with asyncEngine.begin() as conn:
+        await conn.execute(
+            text(f"DELETE FROM books WHERE language = '{SEED_MARKER}'")
+        )
+        await conn.execute(
+            text(
+                f"""
+                INSERT INTO books (
+                    uid, title, author, publisher, published_date,
+                    page_count, language, created_at, updated_at
+                )
+                SELECT
+                    gen_random_uuid(),
+                    initcap({pick} || ' ' || {pick} || ' ' || {pick}),
+                    initcap({pick}) || ' ' || initcap({pick}),
+                    initcap({pick}) || ' Press',
+                    date '1950-01-01' + (random() * 25000)::int,
+                    50 + (random() * 900)::int,
+                    '{SEED_MARKER}',
+                    now() - random() * interval '3650 days',
+                    now()
+                FROM generate_series(1, :rows)
+                """
+            ),
+            {"rows": rows},
+        )
+        await conn.execute(text("ANALYZE books"))
+
+
+async def measure(queries: int, limit: int) -> None:
+    samples = []
+
+    async with AsyncSession(asyncEngine, expire_on_commit=False) as session:
+        for _ in range(queries):
+            query = " ".join(random.sample(WORDS, random.choice([1, 2])))
+
+            startTime = time.perf_counter()
+            await bookService.searchBooks(query, session, limit=limit)
+            samples.append((time.perf_counter() - startTime) * 1000)
+
+    print(f"queries: {queries}, page size: {limit}")
+    report(samples)
+
+
+async def main(args) -> None:
+    if not args.skip_seed:
+        startTime = time.perf_counter()
+        await seed(args.rows)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - startTime:.1f} s")
+
+    await measure(args.queries, args.limit)
+
+    if args.cleanup:
+        async with asyncEngine.begin() as conn:
+            await conn.execute(
+                text(f"DELETE FROM books WHERE language = '{SEED_MARKER}'")
+            )
+
+    await asyncEngine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--skip-seed", action="store_true")
+    parser.add_argument("--cleanup", action="store_true")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,15 @@
+import statistics
+
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+
+    return ordered[index]
+
+
+def report(samples) -> None:
+    print(f"mean: {statistics.mean(samples):.2f} ms")
+    print(f"p50:  {percentile(samples, 0.50):.2f} ms")
+    print(f"p95:  {percentile(samples, 0.95):.2f} ms")
+    print(f"p99:  {percentile(samples, 0.99):.2f} ms")
@@ -0,0 +1,57 @@
+"""add unique tag name
+
+Revision ID: 0c6e4b9f1a23
+Revises: f3a8d2c61b97
+Create Date: 2026-10-18 19:05:48.336127
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0c6e4b9f1a23'
+down_revision: Union[str, None] = 'f3a8d2c61b97'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Fold duplicate tags into the oldest tag of each name before the unique
+    # index can be built, moving their book links across.
+    op.execute(
+        """
+        CREATE TEMPORARY TABLE tag_duplicates ON COMMIT DROP AS
+        SELECT uid, keep
+        FROM (
+            SELECT
+                uid,
+                first_value(uid) OVER (
+                    PARTITION BY name ORDER BY created_at NULLS LAST, uid
+                ) AS keep
+            FROM tags
+        ) ranked
+        WHERE uid <> keep
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO booktag ("bookId", "tagId")
+        SELECT booktag."bookId", tag_duplicates.keep
+        FROM booktag
+        JOIN tag_duplicates ON tag_duplicates.uid = booktag."tagId"
+        ON CONFLICT DO NOTHING
+        """
+    )
+    op.execute(
+        'DELETE FROM booktag WHERE "tagId" IN (SELECT uid FROM tag_duplicates)'
+    )
+    op.execute("DELETE FROM tags WHERE uid IN (SELECT uid FROM tag_duplicates)")
+    op.create_index('ix_tags_name', 'tags', ['name'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tags_name', table_name='tags')
@@ -0,0 +1,29 @@
+"""add books keyset indexes
+
+Revision ID: 4c1d9e2b7f3a
+Revises: a19334a6ed6b
+Create Date: 2026-10-18 10:12:41.503218
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1d9e2b7f3a'
+down_revision: Union[str, None] = 'a19334a6ed6b'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_books_created_at_uid', 'books', ['created_at', 'uid'], unique=False)
+    op.create_index('ix_books_userUid_created_at_uid', 'books', ['userUid', 'created_at', 'uid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_books_userUid_created_at_uid', table_name='books')
+    op.drop_index('ix_books_created_at_uid', table_name='books')
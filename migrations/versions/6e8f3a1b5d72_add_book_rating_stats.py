@@ -0,0 +1,56 @@
+"""add book rating stats
+
+Revision ID: 6e8f3a1b5d72
+Revises: d27a5c0e9f14
+Create Date: 2026-10-18 15:22:09.640513
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6e8f3a1b5d72'
+down_revision: Union[str, None] = 'd27a5c0e9f14'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('book_rating_stats',
+    sa.Column('bookUid', sa.UUID(), nullable=False),
+    sa.Column('rating_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('rating_1', sa.Integer(), nullable=False),
+    sa.Column('rating_2', sa.Integer(), nullable=False),
+    sa.Column('rating_3', sa.Integer(), nullable=False),
+    sa.Column('rating_4', sa.Integer(), nullable=False),
+    sa.Column('rating_5', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['bookUid'], ['books.uid'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('bookUid')
+    )
+    op.execute(
+        """
+        INSERT INTO book_rating_stats (
+            "bookUid", rating_count, rating_sum,
+            rating_1, rating_2, rating_3, rating_4, rating_5
+        )
+        SELECT
+            "bookUid", count(*), sum(rating),
+            count(*) FILTER (WHERE rating = 1),
+            count(*) FILTER (WHERE rating = 2),
+            count(*) FILTER (WHERE rating = 3),
+            count(*) FILTER (WHERE rating = 4),
+            count(*) FILTER (WHERE rating = 5)
+        FROM reviews
+        WHERE "bookUid" IS NOT NULL
+        GROUP BY "bookUid"
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('book_rating_stats')
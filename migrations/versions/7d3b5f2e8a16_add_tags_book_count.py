@@ -0,0 +1,43 @@
+"""add tags book_count
+
+Revision ID: 7d3b5f2e8a16
+Revises: 0c6e4b9f1a23
+Create Date: 2026-10-18 19:42:07.518304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d3b5f2e8a16'
+down_revision: Union[str, None] = '0c6e4b9f1a23'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('tags', sa.Column('book_count', sa.INTEGER(), server_default='0', nullable=False))
+    op.execute(
+        """
+        UPDATE tags
+        SET book_count = counts.book_count
+        FROM (
+            SELECT booktag."tagId", count(*) AS book_count
+            FROM booktag
+            JOIN books ON books.uid = booktag."bookId"
+            WHERE books.deleted_at IS NULL
+            GROUP BY booktag."tagId"
+        ) counts
+        WHERE tags.uid = counts."tagId"
+        """
+    )
+    op.create_index('ix_tags_book_count', 'tags', ['book_count'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tags_book_count', table_name='tags')
+    op.drop_column('tags', 'book_count')
@@ -0,0 +1,29 @@
+"""add version columns
+
+Revision ID: b5c91d7e2a40
+Revises: 6e8f3a1b5d72
+Create Date: 2026-10-18 17:41:52.218904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5c91d7e2a40'
+down_revision: Union[str, None] = '6e8f3a1b5d72'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('version', sa.INTEGER(), server_default='1', nullable=False))
+    op.add_column('users', sa.Column('version', sa.INTEGER(), server_default='1', nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'version')
+    op.drop_column('books', 'version')
@@ -0,0 +1,29 @@
+"""add books deleted_at
+
+Revision ID: f3a8d2c61b97
+Revises: b5c91d7e2a40
+Create Date: 2026-10-18 18:27:13.904215
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3a8d2c61b97'
+down_revision: Union[str, None] = 'b5c91d7e2a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('books', sa.Column('deleted_at', sa.TIMESTAMP(), nullable=True))
+    op.create_index('ix_reviews_bookUid', 'reviews', ['bookUid'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_reviews_bookUid', table_name='reviews')
+    op.drop_column('books', 'deleted_at')
@@ -1,14 +1,36 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 
 from src.books.routes import booksRouter
+from src.books.suggest import suggestionMirror
+from src.auth.revocation import revocationList
+from src.auth.utils import passwordExecutor
 from src.auth.routes import authRouter
 from src.reviews.routes import reviewRouter
+from src.tags.bitmap import tagIndex
 from src.tags.routes import tagsRouter
+from src.internal.routes import internalRouter
 from .errors import registerAllErrors
 from .middleware import registerMiddleware
 
 version = "0.1"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await suggestionMirror.start()
+    await revocationList.start()
+    await tagIndex.start()
+
+    yield
+
+    await tagIndex.stop()
+    await revocationList.stop()
+    await suggestionMirror.stop()
+    passwordExecutor.shutdown()
+
+
 app = FastAPI(
     title="Study-Scope",
     description="A REST API for online library",
@@ -18,7 +40,8 @@ app = FastAPI(
     openapi_url=f"/api/{version}/openapi.json",
     contact={
         "email":"loghunov1@gmail.com"
-    }
+    },
+    lifespan=lifespan,
 )
 
 registerAllErrors(app)
@@ -29,3 +52,4 @@ app.include_router(booksRouter, prefix="/api/{version}/books", tags=["books"])
 app.include_router(authRouter, prefix="/api/{version}/auth", tags=["auth"])
 app.include_router(reviewRouter, prefix="/api/{version}/reviews", tags=["reviews"])
 app.include_router(tagsRouter, prefix="/api/{version}/tags", tags=["tags"])
+app.include_router(internalRouter, prefix="/api/{version}/internal", tags=["internal"])
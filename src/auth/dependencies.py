@@ -5,11 +5,11 @@ from fastapi.security import HTTPBearer
 from fastapi.security.http import HTTPAuthorizationCredentials
 from fastapi.exceptions import HTTPException
 from .utils import decodeToken
-from src.db.redis import tokenInBlocklist
+from .revocation import revocationList
 from src.db.main import getSession
 from sqlmodel.ext.asyncio.session import AsyncSession
 from .service import UserService
-from src.db.models import User
+from .schemas import AuthUserModel
 from src.errors import (
     InvalidToken,
     RevokedToken,
@@ -35,20 +35,17 @@ class TokenBearer(HTTPBearer):
 
         tokenData = decodeToken(token)
 
-        if not self.tokenValid(token):
+        if tokenData is None:
             raise InvalidToken()
 
-        if await tokenInBlocklist(tokenData["jti"]):
+        if await revocationList.isRevoked(tokenData["jti"]):
             raise RevokedToken()
 
         self.verifyTokenData(tokenData)
 
-        return tokenData
-
-    def tokenValid(self, token: str) -> bool:
-        tokenData = decodeToken(token)
+        request.state.tokenData = tokenData
 
-        return tokenData is not None
+        return tokenData
 
     def verifyTokenData(self, tokenData: dict):
         raise NotImplementedError("Please Override this method in child classes")
@@ -74,7 +71,7 @@ async def getCurrentUser(
 ):
     userEmail = tokenDetails["user"]["email"]
 
-    user = await userService.getUserByEmail(userEmail, session)
+    user = await userService.getAuthUser(userEmail, session)
 
     return user
 
@@ -83,7 +80,7 @@ class RoleChecker:
     def __init__(self, allowedRoles: List[str]) -> None:
         self.allowedRoles = allowedRoles
 
-    def __call__(self, currentUser: User = Depends(getCurrentUser)):
+    def __call__(self, currentUser: AuthUserModel = Depends(getCurrentUser)):
 
         if not currentUser.isVerified:
             raise AccountNotVerified()
@@ -0,0 +1,85 @@
+from typing import Dict
+import time
+
+from src.config import Config
+from src.db.pubsub import ChannelMirror
+from src.db.redis import BLOCKLIST_CHANNEL, scanBlocklist, tokenInBlocklist
+from .utils import evictToken
+
+PRUNE_INTERVAL = 60
+
+
+class RevocationList(ChannelMirror):
+    """Per-worker mirror of the Redis token blocklist.
+
+    Seeded with a SCAN of the blocklist keys and kept in step by the
+    `jti exp` messages addJtiToBlocklist publishes. Entries are dropped once
+    their token's `exp` has passed. While the mirror is not current, lookups
+    go to Redis directly.
+    """
+
+    channel = BLOCKLIST_CHANNEL
+    maxLag = Config.REVOCATION_FALLBACK_LAG
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._revoked: Dict[str, float] = {}
+        self.lastPrunedAt = 0.0
+
+    def __len__(self) -> int:
+        return len(self._revoked)
+
+    def add(self, jti: str, exp: float) -> None:
+        evictToken(jti)
+
+        if exp > time.time():
+            self._revoked[jti] = exp
+
+    def contains(self, jti: str) -> bool:
+        exp = self._revoked.get(jti)
+
+        if exp is None:
+            return False
+
+        if exp <= time.time():
+            del self._revoked[jti]
+            return False
+
+        return True
+
+    def prune(self) -> None:
+        now = time.time()
+        self._revoked = {jti: exp for jti, exp in self._revoked.items() if exp > now}
+        self.lastPrunedAt = time.monotonic()
+
+    async def isRevoked(self, jti: str) -> bool:
+        if self.contains(jti):
+            return True
+
+        if self.isCurrent():
+            return False
+
+        return await tokenInBlocklist(jti)
+
+    def decode(self, data: bytes) -> dict:
+        jti, _, exp = data.decode().partition(" ")
+
+        return {"jti": jti, "exp": float(exp)}
+
+    def apply(self, event: dict) -> None:
+        self.add(event["jti"], event["exp"])
+
+    def polled(self) -> None:
+        if self.lastPolledAt - self.lastPrunedAt > PRUNE_INTERVAL:
+            self.prune()
+
+    async def seed(self) -> None:
+        revoked = {}
+        async for jti, exp in scanBlocklist():
+            revoked[jti] = exp
+
+        self._revoked.update(revoked)
+        self.prune()
+
+
+revocationList = RevocationList()
@@ -3,7 +3,7 @@ from datetime import timedelta, datetime
 from fastapi import APIRouter, status, Depends, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
-from src.db.main import getSession
+from src.db.main import getReadSession, getSession
 from src.db.models import User
 from .schemas import (
     UserCreateModel,
@@ -30,13 +30,25 @@ from .dependencies import (
 )
 from src.celery_tasks import send_email
 from src.db.redis import addJtiToBlocklist
+from .revocation import revocationList
 from src.errors import UserAlreadyExists, InvalidCredentials, InvalidToken, UserNotFound
 from src.mail import mail, createMessage
 from src.config import Config
+from src.ratelimit import RateLimiter
 
 authRouter = APIRouter()
 userService = UserService()
 roleChecker = RoleChecker(["admin", "user"])
+loginRateLimiter = RateLimiter(
+    "login",
+    perIp=Config.RATE_LIMIT_LOGIN_PER_IP,
+    perEmail=Config.RATE_LIMIT_LOGIN_PER_EMAIL,
+)
+signupRateLimiter = RateLimiter(
+    "signup",
+    perIp=Config.RATE_LIMIT_SIGNUP_PER_IP,
+    perEmail=Config.RATE_LIMIT_SIGNUP_PER_EMAIL,
+)
 
 REFRESH_TOKEN_EXPIRY = 2
 
@@ -47,11 +59,10 @@ async def verifyUserAccount(token: str, session: AsyncSession = Depends(getSessi
     userEmail = tokenData.get("email")
 
     if userEmail:
-        user = await userService.getUserByEmail(userEmail, session)
+        user = await userService.updateUser(userEmail, {"isVerified": True}, session)
         if not user:
             raise UserNotFound()
 
-        await userService.updateUser(user, {"isVerified": True}, session)
         return JSONResponse(
             content={"message": "Account verified succsessfully"},
             status_code=status.HTTP_200_OK,
@@ -62,7 +73,11 @@ async def verifyUserAccount(token: str, session: AsyncSession = Depends(getSessi
     )
 
 
-@authRouter.post("/signup", status_code=status.HTTP_201_CREATED)
+@authRouter.post(
+    "/signup",
+    status_code=status.HTTP_201_CREATED,
+    dependencies=[Depends(signupRateLimiter)],
+)
 async def createUserAccount(
     userData: UserCreateModel,
     bgTasks: BackgroundTasks,
@@ -94,7 +109,7 @@ async def createUserAccount(
     }
 
 
-@authRouter.post("/login")
+@authRouter.post("/login", dependencies=[Depends(loginRateLimiter)])
 async def loginUsers(
     loginData: UserLoginModel, session: AsyncSession = Depends(getSession)
 ):
@@ -103,7 +118,7 @@ async def loginUsers(
     user: User = await userService.getUserByEmail(email, session)
 
     if user is not None:
-        passwordValid = verifyPassword(password, user.passwordHash)
+        passwordValid = await verifyPassword(password, user.passwordHash)
 
         if passwordValid:
             accessToken = createAccessToken(
@@ -141,15 +156,22 @@ async def getNewAccessToken(tokenDetails: dict = Depends(RefreshTokenBearer())):
 
 
 @authRouter.get("/me", response_model=UserBooksModel)
-async def getCurrentUser(user=Depends(getCurrentUser), _: bool = Depends(roleChecker)):
-    return user
+async def getCurrentUser(
+    user=Depends(getCurrentUser),
+    _: bool = Depends(roleChecker),
+    session: AsyncSession = Depends(getReadSession),
+):
+    userWithBooks = await userService.getUserWithBooks(user.email, session)
+    return userWithBooks
 
 
 @authRouter.get("/logout")
 async def revokeToken(tokenDetails: dict = Depends(AccessTokenBearer())):
     jti = tokenDetails["jti"]
+    exp = tokenDetails["exp"]
 
-    await addJtiToBlocklist(jti)
+    await addJtiToBlocklist(jti, exp)
+    revocationList.add(jti, exp)
 
     return JSONResponse(
         content={"message": "Logged out successfully"}, status_code=status.HTTP_200_OK
@@ -196,13 +218,14 @@ async def resetAccountPassword(
     userEmail = tokenData.get("email")
 
     if userEmail:
-        user = await userService.getUserByEmail(userEmail, session)
+        newPasswordHash = await generatePasswordHash(newPassword)
+
+        user = await userService.updateUser(
+            userEmail, {"passwordHash": newPasswordHash}, session
+        )
         if not user:
             raise UserNotFound()
 
-        newPasswordHash = generatePasswordHash(newPassword)
-
-        await userService.updateUser(user, {"passwordHash": newPasswordHash}, session)
         return JSONResponse(
             content={"message": "Password reset succsessfully"},
             status_code=status.HTTP_200_OK,
@@ -16,6 +16,13 @@ class UserCreateModel(BaseModel):
     password: str = Field(min_length=8)
 
 
+class AuthUserModel(BaseModel):
+    uid: uuid.UUID
+    email: str
+    role: str
+    isVerified: bool
+
+
 class UserModel(BaseModel):
     uid: uuid.UUID
     username: str
@@ -1,19 +1,111 @@
+from datetime import datetime
+from typing import Optional
+import asyncio
+import logging
+import time
+
+from redis.exceptions import RedisError
+from src.cache import TTLCache
+from src.config import Config
 from src.db.models import User
-from .schemas import UserCreateModel
+from src.errors import VersionConflict
+from src.db.redis import (
+    getCachedAuthUser,
+    createAuthUserVersion,
+    setCachedAuthUser,
+    bumpAuthUserVersion,
+)
+from src.db.loaders import getLoaders
+from .schemas import UserCreateModel, AuthUserModel, UserBooksModel, UserModel
 from .utils import generatePasswordHash
 from sqlmodel.ext.asyncio.session import AsyncSession
-from sqlmodel import select
+from sqlmodel import select, update
+
+authUserCache = TTLCache(maxSize=Config.AUTH_USER_LOCAL_SIZE)
 
 
 class UserService:
-    async def getUserByEmail(self, email: str, session: AsyncSession):
-        statement = select(User).where(User.email == email)
+    async def getUserByEmail(self, email: str, session: AsyncSession, options=()):
+        statement = select(User).where(User.email == email).options(*options)
         result = await session.exec(statement)
 
         user = result.first()
 
         return user
 
+    async def getUserWithBooks(self, email: str, session: AsyncSession):
+        user = await self.getUserByEmail(email, session)
+
+        if user is None:
+            return None
+
+        loaders = getLoaders(session)
+        books, reviews = await asyncio.gather(
+            loaders.booksByUser.load(user.uid),
+            loaders.reviewsByUser.load(user.uid),
+        )
+        userData = UserModel.model_validate(user, from_attributes=True)
+
+        return UserBooksModel.model_validate(
+            {**dict(userData), "books": books, "reviews": reviews},
+            from_attributes=True,
+        )
+
+    async def getAuthUser(self, email: str, session: AsyncSession):
+        """Slim (uid, email, role, isVerified) projection used by auth checks.
+
+        Looked up in a short-lived in-process cache, then Redis, then the
+        database; updateUser drops the local entry and bumps the user's
+        version stamp. Redis entries are written under the stamp read before
+        the database, so a lookup that raced with an update cannot put the
+        old projection back.
+        """
+        authUser = authUserCache.get(email)
+        if authUser is not None:
+            return authUser
+
+        version, cached = None, None
+        cacheable = True
+
+        try:
+            version, cached = await getCachedAuthUser(email)
+        except RedisError as e:
+            logging.exception(e)
+            cacheable = False
+
+        if cached is not None:
+            authUser = AuthUserModel.model_validate_json(cached)
+        else:
+            statement = select(User.uid, User.email, User.role, User.isVerified).where(
+                User.email == email
+            )
+            result = await session.exec(statement)
+            row = result.first()
+
+            if row is None:
+                return None
+
+            authUser = AuthUserModel.model_validate(row, from_attributes=True)
+
+            if cacheable:
+                try:
+                    if version is None:
+                        version = await createAuthUserVersion(email)
+
+                    if version is not None:
+                        await setCachedAuthUser(
+                            email,
+                            version,
+                            authUser.model_dump_json(),
+                            Config.AUTH_USER_CACHE_TTL,
+                        )
+                except RedisError as e:
+                    logging.exception(e)
+
+        authUserCache.set(email, authUser, time.time() + Config.AUTH_USER_LOCAL_TTL)
+
+        return authUser
+
     async def userExists(self, email: str, session: AsyncSession):
         user = await self.getUserByEmail(email, session)
 
@@ -22,7 +114,7 @@ class UserService:
     async def createUser(self, userData: UserCreateModel, session: AsyncSession):
         userDataDict = userData.model_dump()
         newUser = User(**userDataDict)
-        newUser.passwordHash = generatePasswordHash(userDataDict["password"])
+        newUser.passwordHash = await generatePasswordHash(userDataDict["password"])
         newUser.role = "user"
 
         session.add(newUser)
@@ -30,10 +122,49 @@ class UserService:
 
         return newUser
 
-    async def updateUser(self, user: User, userData: dict, session: AsyncSession):
-        for key, val in userData.items():
-            setattr(user, key, val)
+    async def updateUser(
+        self,
+        email: str,
+        userData: dict,
+        session: AsyncSession,
+        version: Optional[int] = None,
+    ):
+        """Updates a user with one `UPDATE ... RETURNING` statement.
+
+        Returns None when no user has that email, and raises VersionConflict
+        when `version` is given and no longer matches.
+        """
+        statement = (
+            update(User)
+            .where(User.email == email)
+            .values(**userData, version=User.version + 1, updated_at=datetime.now())
+            .returning(User.uid, User.email, User.version)
+            .execution_options(synchronize_session=False)
+        )
+
+        if version is not None:
+            statement = statement.where(User.version == version)
+
+        result = await session.exec(statement)
+        updatedUser = result.first()
+
+        if updatedUser is None:
+            await session.rollback()
+
+            if version is not None and await self.userExists(email, session):
+                raise VersionConflict()
+
+            return None
 
         await session.commit()
+        await self.invalidateAuthUser(email)
 
-        return user
+        return updatedUser
+
+    async def invalidateAuthUser(self, email: str) -> None:
+        authUserCache.pop(email)
+
+        try:
+            await bumpAuthUserVersion(email)
+        except RedisError as e:
+            logging.exception(e)
@@ -1,6 +1,13 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import timedelta, datetime
+from src.cache import TTLCache
 from src.config import Config
+from src.errors import ServiceBusy
+import asyncio
+import hashlib
+import multiprocessing
+import threading
 import jwt
 import uuid
 import logging
@@ -10,16 +17,92 @@ passwordContext = CryptContext(schemes=["bcrypt"])
 
 ACCESS_TOKEN_EXPIRY = 3600
 
+tokenCache = TTLCache(maxSize=Config.JWT_CACHE_SIZE)
+tokenDigests = TTLCache(maxSize=Config.JWT_CACHE_SIZE)
+
+
+class BoundedExecutor:
+    """Runs blocking calls off the event loop with a cap on queued work.
+
+    At most `workers + queueSize` calls may be in flight; further calls fail
+    fast with ServiceBusy instead of piling up behind a saturated pool. A
+    call stays in flight until the pool is done with it, even when the
+    request awaiting it has been cancelled.
+    """
+
+    def __init__(self, kind: str, workers: int, queueSize: int) -> None:
+        self.kind = kind
+        self.workers = workers
+        self.capacity = workers + queueSize
+        self.inFlight = 0
+        self._lock = threading.Lock()
+        self._executor: Executor | None = None
+
+    def _createExecutor(self) -> Executor:
+        if self.kind == "process":
+            return ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+
+        return ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="password-hash"
+        )
+
+    async def run(self, fn, *args):
+        if self.inFlight >= self.capacity:
+            raise ServiceBusy()
+
+        if self._executor is None:
+            self._executor = self._createExecutor()
+
+        with self._lock:
+            self.inFlight += 1
+
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._release()
+            raise
+
+        future.add_done_callback(self._release)
+
+        return await asyncio.wrap_future(future)
+
+    def _release(self, future: Future | None = None) -> None:
+        with self._lock:
+            self.inFlight -= 1
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+passwordExecutor = BoundedExecutor(
+    kind=Config.PASSWORD_HASH_EXECUTOR,
+    workers=Config.PASSWORD_HASH_WORKERS,
+    queueSize=Config.PASSWORD_HASH_QUEUE_SIZE,
+)
 
-def generatePasswordHash(password: str) -> str:
-    hash = passwordContext.hash(password)
-    return hash
 
+def hashPasswordSync(password: str) -> str:
+    return passwordContext.hash(password)
 
-def verifyPassword(password: str, hash: str) -> bool:
+
+def verifyPasswordSync(password: str, hash: str) -> bool:
     return passwordContext.verify(password, hash)
 
 
+async def generatePasswordHash(password: str) -> str:
+    hash = await passwordExecutor.run(hashPasswordSync, password)
+    return hash
+
+
+async def verifyPassword(password: str, hash: str) -> bool:
+    return await passwordExecutor.run(verifyPasswordSync, password, hash)
+
+
 def createAccessToken(userData: dict, expiry: timedelta = None, refresh: bool = False):
     payload = {}
 
@@ -37,15 +120,42 @@ def createAccessToken(userData: dict, expiry: timedelta = None, refresh: bool =
 
 
 def decodeToken(token: str) -> dict:
+    """Verifies and decodes a JWT, reusing the payload of tokens seen before.
+
+    Verified payloads are cached per worker under a digest of the token until
+    their `exp`, so the signature is checked about once per token.
+    """
+    digest = hashlib.sha256(token.encode()).digest()
+    tokenData = tokenCache.get(digest)
+
+    if tokenData is not None:
+        return tokenData
+
     try:
         tokenData = jwt.decode(
             jwt=token, key=Config.JWT_SECRET, algorithms=[Config.JWT_ALGORITHM]
         )
-        return tokenData
     except Exception as e:
         logging.exception(e)
         return None
 
+    exp = tokenData.get("exp")
+    jti = tokenData.get("jti")
+
+    if exp is not None and jti is not None:
+        tokenCache.set(digest, tokenData, exp)
+        tokenDigests.set(jti, digest, exp)
+
+    return tokenData
+
+
+def evictToken(jti: str) -> None:
+    digest = tokenDigests.get(jti)
+
+    if digest is not None:
+        tokenCache.pop(digest)
+        tokenDigests.pop(jti)
+
 
 serializer = URLSafeTimedSerializer(
         secret_key=Config.JWT_SECRET,
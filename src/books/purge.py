@@ -0,0 +1,75 @@
+"""Set-based cleanup of soft-deleted books.
+
+deleteBook only stamps `deleted_at`; the rows that hang off the book are
+removed here in bounded batches, each in its own short transaction, so a
+popular book never holds thousands of row locks at once.
+"""
+from typing import Callable, Optional
+import uuid
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.db.models import Book, BookTag, Review
+
+ProgressCallback = Callable[[dict], None]
+
+
+def reviewBatch(bookUid: uuid.UUID, batchSize: int):
+    uids = (
+        select(Review.uid).where(Review.bookUid == bookUid).limit(batchSize)
+    ).scalar_subquery()
+
+    return delete(Review).where(Review.uid.in_(uids))
+
+
+def bookTagBatch(bookUid: uuid.UUID, batchSize: int):
+    links = (
+        select(BookTag.bookId, BookTag.tagId)
+        .where(BookTag.bookId == bookUid)
+        .limit(batchSize)
+    )
+
+    return delete(BookTag).where(tuple_(BookTag.bookId, BookTag.tagId).in_(links))
+
+
+async def purgeBook(
+    engine: AsyncEngine,
+    bookUid: str,
+    batchSize: int,
+    onProgress: Optional[ProgressCallback] = None,
+) -> dict:
+    bookUid = uuid.UUID(bookUid)
+    progress = {"book_uid": str(bookUid), "reviews_deleted": 0, "tags_unlinked": 0}
+
+    for key, batch in (
+        ("reviews_deleted", reviewBatch),
+        ("tags_unlinked", bookTagBatch),
+    ):
+        deleted = batchSize
+
+        while deleted == batchSize:
+            async with engine.begin() as conn:
+                result = await conn.execute(batch(bookUid, batchSize))
+
+            deleted = result.rowcount
+            progress[key] += deleted
+
+            if onProgress is not None:
+                onProgress(dict(progress))
+
+    async with engine.begin() as conn:
+        # Rows added while the batches ran go in the same transaction as the
+        # book itself; book_rating_stats follows through ON DELETE CASCADE.
+        result = await conn.execute(delete(Review).where(Review.bookUid == bookUid))
+        progress["reviews_deleted"] += result.rowcount
+
+        result = await conn.execute(delete(BookTag).where(BookTag.bookId == bookUid))
+        progress["tags_unlinked"] += result.rowcount
+
+        result = await conn.execute(
+            delete(Book).where(Book.uid == bookUid, Book.deleted_at.is_not(None))
+        )
+        progress["book_deleted"] = result.rowcount == 1
+
+    return progress
@@ -1,13 +1,34 @@
-from typing import List
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, status, Depends
+from fastapi import APIRouter, status, Depends, Query, Request, Response, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from .service import BookService
-from .schemas import BookModel, BookUpdateModel, BookCreateModel, BookDetailModel
+from .service import (
+    BookService,
+    DEFAULT_PAGE_SIZE,
+    MAX_PAGE_SIZE,
+    DEFAULT_SUGGESTION_LIMIT,
+    MAX_SUGGESTION_LIMIT,
+    MAX_BATCH_SIZE,
+    BOOK_SORTS,
+)
+from .utils import iterLines
+from .schemas import (
+    BookModel,
+    BookUpdateModel,
+    BookCreateModel,
+    BookDetailModel,
+    BookPageModel,
+    BookSuggestionModel,
+    BookBulkResultModel,
+    BookBatchModel,
+)
 from src.auth.dependencies import AccessTokenBearer, RoleChecker
-from src.db.main import getSession
+from src.config import Config
+from src.db.main import getReadSession, getSession
 from src.errors import BookNotFound
+from src.etags import etagMatches, notModified
 
 
 booksRouter = APIRouter()
@@ -16,23 +37,92 @@ accessTokenBearer = AccessTokenBearer()
 roleChecker = Depends(RoleChecker(["admin", "user"]))
 
 
-@booksRouter.get("/", response_model=List[BookModel], dependencies=[roleChecker])
+@booksRouter.get(
+    "/",
+    response_model=Union[BookPageModel, BookBatchModel],
+    dependencies=[roleChecker],
+)
 async def getAllBooks(
-    session: AsyncSession = Depends(getSession),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query(default="created_at", pattern=f"^({'|'.join(BOOK_SORTS)})$"),
+    uids: Optional[List[str]] = Query(default=None),
+    tags: Optional[str] = Query(default=None, min_length=1, max_length=500),
+    session: AsyncSession = Depends(getReadSession),
     tokenDetails: dict = Depends(accessTokenBearer),
 ):
-    books = await BookService.getAllBooks(session)
-    return books
+    if uids:
+        bookUids = [uid.strip() for value in uids for uid in value.split(",") if uid.strip()]
+
+        if len(bookUids) > MAX_BATCH_SIZE:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"At most {MAX_BATCH_SIZE} uids can be requested at once",
+            )
+
+        batch = await BookService.getBooksByUids(bookUids, session)
+        return batch
 
+    page = await BookService.getAllBooks(
+        session, limit=limit, cursor=cursor, sort=sort, tags=tags
+    )
+    return page
 
-@booksRouter.get("/user/{userUid}", response_model=List[BookModel], dependencies=[roleChecker])
+
+@booksRouter.get("/user/{userUid}", response_model=BookPageModel, dependencies=[roleChecker])
 async def getUserBooksSubmissions(
     userUid: str,
-    session: AsyncSession = Depends(getSession),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = Query(default="created_at", pattern=f"^({'|'.join(BOOK_SORTS)})$"),
+    session: AsyncSession = Depends(getReadSession),
+    tokenDetails: dict = Depends(accessTokenBearer),
+):
+    page = await BookService.getUserBooks(
+        userUid, session, limit=limit, cursor=cursor, sort=sort
+    )
+    return page
+
+
+@booksRouter.get("/search", response_model=BookPageModel, dependencies=[roleChecker])
+async def searchBooks(
+    q: str = Query(min_length=1, max_length=200),
+    limit: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    session: AsyncSession = Depends(getReadSession),
+    tokenDetails: dict = Depends(accessTokenBearer),
+):
+    page = await BookService.searchBooks(q, session, limit=limit, cursor=cursor)
+    return page
+
+
+@booksRouter.get(
+    "/suggest", response_model=List[BookSuggestionModel], dependencies=[roleChecker]
+)
+async def suggestBooks(
+    prefix: str = Query(min_length=1, max_length=100),
+    limit: int = Query(default=DEFAULT_SUGGESTION_LIMIT, ge=1, le=MAX_SUGGESTION_LIMIT),
+    session: AsyncSession = Depends(getReadSession),
+    tokenDetails: dict = Depends(accessTokenBearer),
+):
+    suggestions = await BookService.suggestBooks(prefix, session, limit=limit)
+    return suggestions
+
+
+@booksRouter.get("/export", dependencies=[roleChecker])
+async def exportBooks(
+    exportFormat: str = Query(default="ndjson", alias="format", pattern="^(ndjson|csv)$"),
     tokenDetails: dict = Depends(accessTokenBearer),
 ):
-    books = await BookService.getUserBooks(userUid, session)
-    return books
+    mediaType = "text/csv" if exportFormat == "csv" else "application/x-ndjson"
+
+    return StreamingResponse(
+        BookService.exportBooks(exportFormat),
+        media_type=mediaType,
+        headers={
+            "Content-Disposition": f'attachment; filename="books.{exportFormat}"'
+        },
+    )
 
 
 @booksRouter.post(
@@ -51,13 +141,57 @@ async def createBook(
     return newBook
 
 
+@booksRouter.post(
+    "/bulk",
+    response_model=BookBulkResultModel,
+    dependencies=[roleChecker],
+)
+async def bulkCreateBooks(
+    request: Request,
+    session: AsyncSession = Depends(getSession),
+    tokenDetails: dict = Depends(accessTokenBearer),
+):
+    contentType = request.headers.get("content-type", "").split(";")[0].strip()
+
+    if contentType == "text/csv":
+        bulkFormat = "csv"
+    elif contentType in ("application/x-ndjson", "application/ndjson"):
+        bulkFormat = "ndjson"
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Send text/csv or application/x-ndjson",
+        )
+
+    userId = tokenDetails["user"]["userUid"]
+    result = await BookService.bulkCreateBooks(
+        iterLines(request.stream(), Config.BULK_MAX_LINE_LENGTH),
+        bulkFormat,
+        userId,
+        session,
+    )
+    return result
+
+
 @booksRouter.get("/{book_uid}", response_model=BookDetailModel, dependencies=[roleChecker])
 async def getBookById(
     book_uid: str,
-    session: AsyncSession = Depends(getSession),
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(getReadSession),
     tokenDetails: dict = Depends(accessTokenBearer),
 ) -> dict:
-    book = await BookService.getBook(book_uid, session)
+    etag = await BookService.getBookEtag(book_uid)
+
+    if etag is not None:
+        if etagMatches(request.headers.get("if-none-match"), etag):
+            return notModified(etag)
+
+        # a lagging replica may not have the write that set this version yet
+        if not session.info.get("replica"):
+            response.headers["ETag"] = etag
+
+    book = await BookService.getBookDetail(book_uid, session)
     if book:
         return book
     else:
@@ -1,4 +1,4 @@
-from typing import List
+from typing import List, Optional
 from datetime import datetime, date
 import uuid
 
@@ -18,13 +18,48 @@ class BookModel(BaseModel):
     language: str
     created_at: datetime
     updated_at: datetime
+    version: Optional[int] = None
+    rating_count: Optional[int] = None
+    rating_avg: Optional[float] = None
     
 
+class BookPageModel(BaseModel):
+    books: List[BookModel]
+    next_cursor: Optional[str] = None
+
+
 class BookDetailModel(BookModel):
+    rating_histogram: Optional[List[int]] = None
     reviews: List[ReviewModel]
     tags: List[TagModel]
 
 
+class BookBatchItemModel(BaseModel):
+    uid: str
+    found: bool
+    book: Optional[BookDetailModel] = None
+
+
+class BookBatchModel(BaseModel):
+    items: List[BookBatchItemModel]
+
+
+class BookSuggestionModel(BaseModel):
+    text: str
+    kind: str
+
+
+class BookBulkErrorModel(BaseModel):
+    line: int
+    message: str
+
+
+class BookBulkResultModel(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[BookBulkErrorModel]
+
+
 class BookCreateModel(BaseModel):
     title: str
     author: str
@@ -40,4 +75,5 @@ class BookUpdateModel(BaseModel):
     publisher: str
     page_count: int
     language: str
+    version: Optional[int] = None
     
\ No newline at end of file
@@ -1,30 +1,291 @@
-from datetime import datetime
+from datetime import datetime, date
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import csv
+import io
+import json
 import logging
+import uuid
 
+from asyncpg.exceptions import PostgresError
+from pydantic import ValidationError
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
 from sqlmodel.ext.asyncio.session import AsyncSession
-from .schemas import BookCreateModel, BookUpdateModel
-from sqlmodel import select, desc
-from src.db.models import Book
+from .schemas import BookCreateModel, BookUpdateModel, BookDetailModel
+from .utils import encodeCursor, decodeCursor, encodeRankCursor, decodeRankCursor
+from .suggest import suggestionIndex, suggestionMirror, TITLE, AUTHOR
+from sqlmodel import select, desc, tuple_, func, cast, Float
+from sqlalchemy import any_, bindparam, update
+import sqlalchemy.dialects.postgresql as pg
+from src.db.loaders import getLoaders
+from src.db.main import replicaSessionFactory
+from src.db.models import Book, BookRatingStats, BookTag, Tag, SEARCH_CONFIG
+from src.db.redis import (
+    getCachedBooks,
+    createBookVersions,
+    setCachedBooks,
+    bumpBookVersions,
+    getVersion,
+    bumpVersion,
+    bookVersionKey,
+    TAGS_VERSION_KEY,
+)
+from src.etags import makeEtag
+from src.metrics import CacheStats
+from src.reviews.ratings import (
+    ratingCountColumn,
+    ratingAvgColumn,
+    ratingSortKey,
+    ratingSummary,
+)
+from src.celery_tasks import purge_book
+from src.tags.bitmap import tagIndex
+from src.tags.expressions import parseTagExpression
+from src.config import Config
+from src.errors import LineTooLong, VersionConflict
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+DEFAULT_SUGGESTION_LIMIT = 10
+MAX_SUGGESTION_LIMIT = 25
+MAX_BATCH_SIZE = 500
+BOOK_SORTS = ("created_at", "rating")
+
+BULK_COLUMNS = (
+    "uid",
+    "title",
+    "author",
+    "publisher",
+    "published_date",
+    "page_count",
+    "language",
+    "userUid",
+    "created_at",
+    "updated_at",
+)
+MAX_REPORTED_ERRORS = 1000
+BOOK_COLUMNS = (
+    "uid",
+    "title",
+    "author",
+    "publisher",
+    "published_date",
+    "page_count",
+    "language",
+    "created_at",
+    "updated_at",
+    "version",
+)
+EXPORT_CHUNK_SIZE = 1000
+
+bookCacheStats = CacheStats()
+
+
+def bookColumns():
+    """Columns needed by BookModel; selecting them loads no relationships."""
+    return [getattr(Book, name) for name in BOOK_COLUMNS]
+
+
+def bookListStatement():
+    """BookModel columns plus O(1) rating aggregates from book_rating_stats,
+    for books that have not been deleted."""
+    return (
+        select(
+            *bookColumns(),
+            ratingCountColumn().label("rating_count"),
+            ratingAvgColumn().label("rating_avg"),
+        )
+        .outerjoin(BookRatingStats, BookRatingStats.bookUid == Book.uid)
+        .where(Book.deleted_at.is_(None))
+    )
+
+
+def exportValue(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+
+    return value
+
+
+def formatRowError(error: Exception) -> str:
+    if isinstance(error, ValidationError):
+        return "; ".join(
+            f"{'.'.join(str(part) for part in item['loc']) or 'row'}: {item['msg']}"
+            for item in error.errors()
+        )
+
+    return str(error)
 
 
 class BookService:
-    async def getAllBooks(self, session: AsyncSession):
-        statement = select(Book).order_by(desc(Book.created_at))
+    async def getAllBooks(
+        self,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+        tags: Optional[str] = None,
+    ):
+        """One page of books, optionally narrowed by a boolean tag
+        expression that is resolved through the worker's tag index."""
+        statement = bookListStatement()
+
+        if tags is not None:
+            statement = statement.where(tagIndex.filter(parseTagExpression(tags)))
+
+        return await self.getBooksPage(statement, limit, cursor, session, sort)
+
+    async def getUserBooks(
+        self,
+        userUid: str,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+        sort: str = "created_at",
+    ):
+        statement = bookListStatement().where(Book.userUid == userUid)
+
+        return await self.getBooksPage(statement, limit, cursor, session, sort)
+
+    async def getBooksPage(
+        self,
+        statement,
+        limit: int,
+        cursor: Optional[str],
+        session: AsyncSession,
+        sort: str = "created_at",
+    ):
+        """Runs `statement` as one keyset page, newest first or best rated
+        first, with uid as the tie-breaker.
+
+        One extra row is fetched to find out whether another page exists, so
+        the cost of a page does not depend on how deep the client has gone.
+        """
+        if sort == "rating":
+            sortKey = ratingSortKey()
+
+            if cursor is not None:
+                rating, uid = decodeRankCursor(cursor)
+                statement = statement.where(
+                    tuple_(sortKey, Book.uid) < tuple_(cast(rating, Float), uid)
+                )
+        else:
+            sortKey = Book.created_at
+
+            if cursor is not None:
+                createdAt, uid = decodeCursor(cursor)
+                statement = statement.where(
+                    tuple_(Book.created_at, Book.uid) < tuple_(createdAt, uid)
+                )
+
+        statement = statement.order_by(desc(sortKey), desc(Book.uid)).limit(limit + 1)
         result = await session.exec(statement)
+        books = result.all()
 
-        return result.all()
+        nextCursor = None
+        if len(books) > limit:
+            books = books[:limit]
+            lastBook = books[-1]
 
-    async def getUserBooks(self, userUid: str, session: AsyncSession):
-        statement = (
-            select(Book).where(Book.userUid == userUid).order_by(desc(Book.created_at))
+            if sort == "rating":
+                nextCursor = encodeRankCursor(lastBook.rating_avg or 0.0, lastBook.uid)
+            else:
+                nextCursor = encodeCursor(lastBook.created_at, lastBook.uid)
+
+        return {"books": books, "next_cursor": nextCursor}
+
+    async def searchBooks(
+        self,
+        query: str,
+        session: AsyncSession,
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None,
+    ):
+        """Full-text search over title, author and publisher.
+
+        Matches go through the GIN index on `books.search_vector`; results
+        are ordered by ts_rank and paginated on (rank, uid).
+        """
+        tsQuery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+        rank = func.ts_rank(Book.search_vector, tsQuery)
+
+        statement = bookListStatement().add_columns(rank.label("rank")).where(
+            Book.search_vector.bool_op("@@")(tsQuery)
         )
+
+        if cursor is not None:
+            rankValue, uid = decodeRankCursor(cursor)
+            statement = statement.where(
+                tuple_(rank, Book.uid) < tuple_(cast(rankValue, pg.REAL), uid)
+            )
+
+        statement = statement.order_by(desc(rank), desc(Book.uid)).limit(limit + 1)
         result = await session.exec(statement)
-        
-        return result.all()
+        rows = result.all()
+
+        nextCursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            nextCursor = encodeRankCursor(rows[-1].rank, rows[-1].uid)
+
+        return {"books": rows, "next_cursor": nextCursor}
+
+    async def suggestBooks(
+        self,
+        prefix: str,
+        session: AsyncSession,
+        limit: int = DEFAULT_SUGGESTION_LIMIT,
+    ):
+        """Suggests titles and authors starting with `prefix`.
+
+        Keystrokes are answered from the in-process prefix index; the
+        database is only asked (with a trigram match that tolerates typos)
+        when the index is not built yet or has no exact prefix match.
+        """
+        if suggestionMirror.isCurrent():
+            matches = suggestionIndex.search(prefix, limit)
+
+            if matches:
+                return [{"text": text, "kind": kind} for kind, text in matches]
 
-    async def getBook(self, bookUid: str, session: AsyncSession):
+        return await self.suggestBooksFromDb(prefix, session, limit)
+
+    async def suggestBooksFromDb(
+        self, prefix: str, session: AsyncSession, limit: int
+    ):
+        suggestions = []
+
+        for kind, column in ((TITLE, Book.title), (AUTHOR, Book.author)):
+            score = func.word_similarity(prefix, column)
+            statement = (
+                select(column, score.label("score"))
+                .where(column.op("%>")(prefix), Book.deleted_at.is_(None))
+                .distinct()
+                .order_by(desc(score))
+                .limit(limit)
+            )
+            result = await session.exec(statement)
+
+            suggestions.extend(
+                (rowScore, {"text": text, "kind": kind}) for text, rowScore in result
+            )
+
+        suggestions.sort(key=lambda item: item[0], reverse=True)
+
+        return [suggestion for _, suggestion in suggestions[:limit]]
+
+    async def getBook(self, bookUid: str, session: AsyncSession, options=()):
+        """Loads one Book entity. Relationships are only loaded when asked for
+        through loader `options`, e.g. selectinload(Book.tags)."""
         try:
-            statement = select(Book).where(Book.uid == bookUid)
+            statement = (
+                select(Book)
+                .where(Book.uid == bookUid, Book.deleted_at.is_(None))
+                .options(*options)
+            )
             result = await session.exec(statement)
         except Exception as e:
             logging.exception(e)
@@ -32,6 +293,180 @@ class BookService:
 
         return result.first()
 
+    async def getBookDetail(self, bookUid: str, session: AsyncSession):
+        try:
+            bookUid = str(uuid.UUID(bookUid))
+        except ValueError:
+            return None
+
+        bookDetails = await self.getBookDetails([bookUid], session)
+
+        return bookDetails.get(bookUid)
+
+    async def getBookDetails(
+        self, bookUids: List[str], session: AsyncSession
+    ) -> Dict[str, BookDetailModel]:
+        """Read-through Redis cache in front of the book detail query.
+
+        `bookUids` must be canonical UUID strings. Cached entries are
+        stamped with the book's version and ignored once invalidateBooks
+        has moved it on; all misses are loaded with a single
+        `uid = ANY(:uids)` query, their reviews and tags through the
+        session's batching loaders, and written back in one pipeline. Redis
+        failures fall back to the database.
+
+        Rows read on a replica session are not written back: the replica
+        may still hold the version invalidateBooks has just replaced, and
+        caching it under the new stamp would serve it to every reader.
+        """
+        if not bookUids:
+            return {}
+
+        cacheable = not session.info.get("replica", False)
+
+        try:
+            cached = await getCachedBooks(bookUids)
+        except RedisError as e:
+            logging.exception(e)
+            bookCacheStats.errors += 1
+            cached = [(None, None)] * len(bookUids)
+            cacheable = False
+
+        bookDetails = {}
+        missVersions = {}
+
+        for bookUid, (version, payload) in zip(bookUids, cached):
+            if payload is not None:
+                bookCacheStats.hits += 1
+                bookDetails[bookUid] = BookDetailModel.model_validate_json(payload)
+            else:
+                bookCacheStats.misses += 1
+                missVersions[bookUid] = version
+
+        if not missVersions:
+            return bookDetails
+
+        statement = (
+            select(Book, BookRatingStats)
+            .outerjoin(BookRatingStats, BookRatingStats.bookUid == Book.uid)
+            .where(
+                Book.uid
+                == any_(
+                    bindparam(
+                        "bookUids",
+                        [uuid.UUID(bookUid) for bookUid in missVersions],
+                        type_=pg.ARRAY(pg.UUID),
+                    )
+                ),
+                Book.deleted_at.is_(None),
+            )
+        )
+        rows = (await session.exec(statement)).all()
+
+        loaders = getLoaders(session)
+        loadedUids = [book.uid for book, _ in rows]
+        reviews, tags = await asyncio.gather(
+            loaders.reviewsByBook.loadMany(loadedUids),
+            loaders.tagsByBook.loadMany(loadedUids),
+        )
+
+        if cacheable:
+            await self.stampBooks(
+                [str(book.uid) for book, _ in rows], missVersions
+            )
+
+        writeBack = []
+        for (book, ratingStats), bookReviews, bookTags in zip(rows, reviews, tags):
+            bookUid = str(book.uid)
+            bookData = {name: getattr(book, name) for name in BOOK_COLUMNS}
+            bookDetail = BookDetailModel.model_validate(
+                {
+                    **bookData,
+                    **ratingSummary(ratingStats),
+                    "reviews": bookReviews,
+                    "tags": bookTags,
+                },
+                from_attributes=True,
+            )
+            bookDetails[bookUid] = bookDetail
+
+            if cacheable and missVersions.get(bookUid) is not None:
+                writeBack.append(
+                    (bookUid, missVersions[bookUid], bookDetail.model_dump_json())
+                )
+
+        if writeBack:
+            try:
+                await setCachedBooks(writeBack, Config.BOOK_CACHE_TTL)
+            except RedisError as e:
+                logging.exception(e)
+                bookCacheStats.errors += 1
+
+        return bookDetails
+
+    async def stampBooks(self, bookUids: List[str], versions: dict) -> None:
+        """Gives books that were just found in the database, but have no
+        version stamp yet, a fresh one in `versions`. Stamps are only created
+        here, never on a lookup, so unknown uids do not leave keys behind."""
+        unstamped = [bookUid for bookUid in bookUids if versions.get(bookUid) is None]
+
+        if not unstamped:
+            return
+
+        try:
+            created = await createBookVersions(unstamped)
+        except RedisError as e:
+            logging.exception(e)
+            bookCacheStats.errors += 1
+            return
+
+        versions.update(zip(unstamped, created))
+
+    async def getBooksByUids(self, bookUids: List[str], session: AsyncSession):
+        """Resolves many books at once, in request order, with explicit
+        not-found markers for unknown or malformed uids."""
+        canonicalUids = {}
+        for bookUid in bookUids:
+            try:
+                canonicalUids[bookUid] = str(uuid.UUID(bookUid))
+            except ValueError:
+                canonicalUids[bookUid] = None
+
+        bookDetails = await self.getBookDetails(
+            list(dict.fromkeys(uid for uid in canonicalUids.values() if uid)),
+            session,
+        )
+
+        items = []
+        for bookUid in bookUids:
+            bookDetail = bookDetails.get(canonicalUids[bookUid])
+            items.append(
+                {"uid": bookUid, "found": bookDetail is not None, "book": bookDetail}
+            )
+
+        return {"items": items}
+
+    async def getBookEtag(self, bookUid: str) -> Optional[str]:
+        """Strong ETag for a book's detail, derived from its version stamp
+        in Redis so it can be checked without touching the database. Books
+        that have not been stamped yet have no ETag."""
+        try:
+            version = await getVersion(bookVersionKey(str(uuid.UUID(bookUid))))
+        except ValueError:
+            return None
+        except RedisError as e:
+            logging.exception(e)
+            return None
+
+        return makeEtag(version) if version is not None else None
+
+    async def invalidateBooks(self, *bookUids) -> None:
+        try:
+            await bumpBookVersions(str(bookUid) for bookUid in bookUids)
+        except RedisError as e:
+            logging.exception(e)
+            bookCacheStats.errors += 1
+
     async def createBook(
         self, bookData: BookCreateModel, userUid: str, session: AsyncSession
     ):
@@ -44,29 +479,266 @@ class BookService:
         session.add(newBook)
         await session.commit()
 
+        await suggestionMirror.publish(
+            {"op": "add", "books": [[str(newBook.uid), newBook.title, newBook.author]]}
+        )
+
         return newBook
 
+    async def bulkCreateBooks(
+        self,
+        lines: AsyncIterator[Tuple[int, bytes]],
+        bulkFormat: str,
+        userUid: str,
+        session: AsyncSession,
+    ):
+        """Validates streamed CSV/NDJSON rows and writes them with COPY.
+
+        Rows are validated one at a time and written in batches of
+        BULK_INSERT_BATCH_SIZE, each batch committed on its own, so memory
+        stays bounded by the batch size rather than the upload size. An
+        overlong line stops the ingest; the LineTooLong it raises carries
+        the number of rows committed before it, while the rows of the
+        unfinished batch are dropped.
+        """
+        userUid = uuid.UUID(str(userUid))
+        inserted = 0
+        failed = 0
+        errors = []
+        header = None
+        batch = []
+
+        def reportError(lineNumber: int, message: str) -> None:
+            nonlocal failed
+            failed += 1
+
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({"line": lineNumber, "message": message})
+
+        async def flush() -> None:
+            nonlocal inserted
+
+            try:
+                await self.copyBooks([record for _, record in batch], session)
+                inserted += len(batch)
+            except (PostgresError, SQLAlchemyError) as e:
+                logging.exception(e)
+                await session.rollback()
+
+                for lineNumber, _ in batch:
+                    reportError(lineNumber, "batch was rejected by the database")
+
+        try:
+            async for lineNumber, line in lines:
+                if not line.strip():
+                    continue
+
+                try:
+                    text = line.decode()
+
+                    if bulkFormat == "csv":
+                        values = next(csv.reader([text]))
+
+                        if header is None:
+                            header = [value.strip() for value in values]
+                            continue
+
+                        rowData = dict(zip(header, values))
+                    else:
+                        rowData = json.loads(text)
+
+                    bookData = BookCreateModel.model_validate(rowData)
+                    publishedDate = date.fromisoformat(bookData.published_date)
+                except (ValueError, csv.Error) as e:
+                    reportError(lineNumber, formatRowError(e))
+                    continue
+
+                now = datetime.now()
+                batch.append(
+                    (
+                        lineNumber,
+                        (
+                            uuid.uuid4(),
+                            bookData.title,
+                            bookData.author,
+                            bookData.publisher,
+                            publishedDate,
+                            bookData.page_count,
+                            bookData.language,
+                            userUid,
+                            now,
+                            now,
+                        ),
+                    )
+                )
+
+                if len(batch) >= Config.BULK_INSERT_BATCH_SIZE:
+                    await flush()
+                    batch = []
+        except LineTooLong as e:
+            e.inserted = inserted
+            raise
+
+        if batch:
+            await flush()
+
+        return {"inserted": inserted, "failed": failed, "errors": errors}
+
+    async def copyBooks(self, records: list, session: AsyncSession) -> None:
+        connection = await session.connection()
+        rawConnection = await connection.get_raw_connection()
+
+        await rawConnection.driver_connection.copy_records_to_table(
+            Book.__tablename__, records=records, columns=BULK_COLUMNS
+        )
+        await session.commit()
+
+        await suggestionMirror.publish(
+            {
+                "op": "add",
+                "books": [[str(record[0]), record[1], record[2]] for record in records],
+            }
+        )
+
+    async def exportBooks(self, exportFormat: str) -> AsyncIterator[bytes]:
+        """Streams the catalog as NDJSON or CSV from a server-side cursor.
+
+        Rows are fetched and encoded EXPORT_CHUNK_SIZE at a time, so memory
+        stays flat regardless of table size. The session is owned by the
+        generator because the response outlives the request dependencies, and
+        reads from the replica when one is configured.
+        """
+        statement = select(*bookColumns()).where(Book.deleted_at.is_(None))
+
+        if exportFormat == "csv":
+            yield (",".join(BOOK_COLUMNS) + "\r\n").encode()
+
+        async with replicaSessionFactory() as session:
+            result = await session.stream(
+                statement.execution_options(yield_per=EXPORT_CHUNK_SIZE)
+            )
+
+            async for rows in result.partitions(EXPORT_CHUNK_SIZE):
+                buffer = io.StringIO()
+
+                if exportFormat == "csv":
+                    writer = csv.writer(buffer)
+                    writer.writerows(
+                        [exportValue(value) for value in row] for row in rows
+                    )
+                else:
+                    for row in rows:
+                        buffer.write(
+                            json.dumps(
+                                {
+                                    name: exportValue(value)
+                                    for name, value in zip(BOOK_COLUMNS, row)
+                                }
+                            )
+                        )
+                        buffer.write("\n")
+
+                yield buffer.getvalue().encode()
+
     async def updateBook(
         self, bookUID: str, updateData: BookUpdateModel, session: AsyncSession
     ):
-        bookToUpdate = await self.getBook(bookUID, session)
+        """Applies the update in one `UPDATE ... RETURNING` statement.
 
-        if bookToUpdate is not None:
-            updateDataDict = updateData.model_dump()
-            updateDataDict["updated_at"] = datetime.now()
+        When `updateData.version` is given the row is only updated if it still
+        has that version; otherwise VersionConflict is raised. Every update
+        bumps the version.
+        """
+        try:
+            bookUid = uuid.UUID(bookUID)
+        except ValueError:
+            return None
 
-            for key, value in updateDataDict.items():
-                setattr(bookToUpdate, key, value)
+        values = updateData.model_dump(exclude={"version"})
+        values["updated_at"] = datetime.now()
 
-            await session.commit()
+        statement = (
+            update(Book)
+            .where(Book.uid == bookUid, Book.deleted_at.is_(None))
+            .values(**values, version=Book.version + 1)
+            .returning(*bookColumns())
+            .execution_options(synchronize_session=False)
+        )
+
+        if updateData.version is not None:
+            statement = statement.where(Book.version == updateData.version)
+
+        result = await session.exec(statement)
+        updatedBook = result.first()
+
+        if updatedBook is None:
+            await session.rollback()
+
+            if updateData.version is not None:
+                exists = await session.exec(
+                    select(Book.uid).where(
+                        Book.uid == bookUid, Book.deleted_at.is_(None)
+                    )
+                )
+                if exists.first() is not None:
+                    raise VersionConflict()
 
-            return bookToUpdate
-        else:
             return None
 
+        await session.commit()
+        await self.invalidateBooks(bookUid)
+
+        await suggestionMirror.publish(
+            {
+                "op": "add",
+                "books": [[str(bookUid), updatedBook.title, updatedBook.author]],
+            }
+        )
+
+        return updatedBook
+
     async def deleteBook(self, bookUID: str, session: AsyncSession):
-        bookToDelete = await self.getBook(bookUID, session)
-        if bookToDelete is not None:
-            await session.delete(bookToDelete)
-            await session.commit()
-            return {}
+        """Hides the book at once by stamping `deleted_at` and taking it off
+        the `book_count` of its tags; its reviews and tag links are purged
+        afterwards by the purge_book Celery task."""
+        try:
+            bookUid = uuid.UUID(bookUID)
+        except ValueError:
+            return None
+
+        statement = (
+            update(Book)
+            .where(Book.uid == bookUid, Book.deleted_at.is_(None))
+            .values(deleted_at=datetime.now(), version=Book.version + 1)
+            .returning(Book.uid)
+            .execution_options(synchronize_session=False)
+        )
+        result = await session.exec(statement)
+        deletedBook = result.first()
+
+        if deletedBook is None:
+            return None
+
+        await session.exec(
+            update(Tag)
+            .where(Tag.uid.in_(select(BookTag.tagId).where(BookTag.bookId == bookUid)))
+            .values(book_count=Tag.book_count - 1)
+            .execution_options(synchronize_session=False)
+        )
+        await session.commit()
+        await self.invalidateBooks(bookUid)
+        await tagIndex.publish({"op": "drop", "book": str(bookUid)})
+
+        try:
+            await bumpVersion(TAGS_VERSION_KEY)
+        except RedisError as e:
+            logging.exception(e)
+
+        await suggestionMirror.publish({"op": "remove", "books": [str(bookUid)]})
+
+        try:
+            purge_book.delay(str(bookUid))
+        except Exception as e:
+            logging.exception(e)
+
+        return {}
@@ -0,0 +1,142 @@
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Tuple
+import uuid
+
+from sqlmodel import select
+
+from src.db.main import sessionFactory
+from src.db.models import Book
+from src.db.pubsub import ChannelMirror
+from src.db.redis import SUGGESTION_CHANNEL
+
+TITLE = "title"
+AUTHOR = "author"
+SEED_CHUNK_SIZE = 10000
+
+
+def normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+
+class PrefixIndex:
+    """In-process sorted-array index of book titles and authors.
+
+    Entries are kept as (normalized text, kind, text) tuples in one sorted
+    list, so a prefix lookup is a binary search followed by a short scan.
+    Each entry is reference counted because many books share an author.
+    Books are tracked by uid, so adding a book again replaces its previous
+    title and author and repeating an add or remove changes nothing.
+    """
+
+    def __init__(self) -> None:
+        self._entries: List[Tuple[str, str, str]] = []
+        self._counts: Dict[Tuple[str, str, str], int] = {}
+        self._books: Dict[uuid.UUID, Tuple[str, str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def rebuild(self, books: Iterable[Tuple[uuid.UUID, str, str]]) -> None:
+        counts: Dict[Tuple[str, str, str], int] = {}
+        bookTexts: Dict[uuid.UUID, Tuple[str, str]] = {}
+
+        for bookUid, title, author in books:
+            bookTexts[bookUid] = (title, author)
+
+            for kind, text in ((TITLE, title), (AUTHOR, author)):
+                entry = (normalize(text), kind, text)
+                counts[entry] = counts.get(entry, 0) + 1
+
+        self._counts = counts
+        self._entries = sorted(counts)
+        self._books = bookTexts
+
+    def add(self, kind: str, text: str) -> None:
+        entry = (normalize(text), kind, text)
+        count = self._counts.get(entry, 0)
+
+        if count == 0:
+            insort(self._entries, entry)
+
+        self._counts[entry] = count + 1
+
+    def remove(self, kind: str, text: str) -> None:
+        entry = (normalize(text), kind, text)
+        count = self._counts.get(entry, 0)
+
+        if count > 1:
+            self._counts[entry] = count - 1
+        elif count == 1:
+            del self._counts[entry]
+            position = bisect_left(self._entries, entry)
+            del self._entries[position]
+
+    def addBook(self, bookUid: uuid.UUID, title: str, author: str) -> None:
+        if self._books.get(bookUid) == (title, author):
+            return
+
+        self.removeBook(bookUid)
+        self._books[bookUid] = (title, author)
+        self.add(TITLE, title)
+        self.add(AUTHOR, author)
+
+    def removeBook(self, bookUid: uuid.UUID) -> None:
+        texts = self._books.pop(bookUid, None)
+
+        if texts is not None:
+            title, author = texts
+            self.remove(TITLE, title)
+            self.remove(AUTHOR, author)
+
+    def search(self, prefix: str, limit: int) -> List[Tuple[str, str]]:
+        key = normalize(prefix)
+        position = bisect_left(self._entries, (key,))
+        matches = []
+
+        while position < len(self._entries) and len(matches) < limit:
+            normalized, kind, text = self._entries[position]
+            if not normalized.startswith(key):
+                break
+
+            matches.append((kind, text))
+            position += 1
+
+        return matches
+
+
+class SuggestionMirror(ChannelMirror):
+    """Keeps a worker's PrefixIndex in step with the other workers' book
+    writes over the suggestion channel."""
+
+    channel = SUGGESTION_CHANNEL
+
+    def __init__(self, index: PrefixIndex) -> None:
+        super().__init__()
+        self.index = index
+
+    async def seed(self) -> None:
+        async with sessionFactory() as session:
+            result = await session.stream(
+                select(Book.uid, Book.title, Book.author)
+                .where(Book.deleted_at.is_(None))
+                .execution_options(yield_per=SEED_CHUNK_SIZE)
+            )
+            books = [tuple(row) async for row in result]
+
+        self.index.rebuild(books)
+
+    def apply(self, event: dict) -> None:
+        op = event.get("op")
+
+        if op == "add":
+            for bookUid, title, author in event["books"]:
+                self.index.addBook(uuid.UUID(bookUid), title, author)
+        elif op == "remove":
+            for bookUid in event["books"]:
+                self.index.removeBook(uuid.UUID(bookUid))
+        else:
+            raise ValueError(op)
+
+
+suggestionIndex = PrefixIndex()
+suggestionMirror = SuggestionMirror(suggestionIndex)
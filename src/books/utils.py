@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import AsyncIterator, Tuple
+import base64
+import binascii
+import json
+import uuid
+
+from src.errors import InvalidCursor, LineTooLong
+
+
+def _encode(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> list:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, binascii.Error):
+        raise InvalidCursor()
+
+    if not isinstance(values, list):
+        raise InvalidCursor()
+
+    return values
+
+
+def encodeCursor(createdAt: datetime, uid: uuid.UUID) -> str:
+    return _encode([createdAt.isoformat(), str(uid)])
+
+
+def decodeCursor(cursor: str) -> Tuple[datetime, uuid.UUID]:
+    values = _decode(cursor)
+
+    try:
+        createdAt, uid = values
+        return datetime.fromisoformat(createdAt), uuid.UUID(uid)
+    except (TypeError, ValueError):
+        raise InvalidCursor()
+
+
+def encodeRankCursor(rank: float, uid: uuid.UUID) -> str:
+    return _encode([rank, str(uid)])
+
+
+def decodeRankCursor(cursor: str) -> Tuple[float, uuid.UUID]:
+    values = _decode(cursor)
+
+    try:
+        rank, uid = values
+        return float(rank), uuid.UUID(uid)
+    except (TypeError, ValueError):
+        raise InvalidCursor()
+
+
+async def iterLines(
+    chunks: AsyncIterator[bytes], maxLength: int
+) -> AsyncIterator[Tuple[int, bytes]]:
+    """Splits a streamed request body into numbered lines without buffering it.
+
+    Only the unfinished tail of the body is kept, and each chunk is searched
+    for newlines from where the previous search stopped, so a long line
+    costs linear time. A line longer than `maxLength` bytes raises
+    LineTooLong instead of growing the buffer without bound.
+    """
+    buffer = bytearray()
+    lineNumber = 0
+
+    async for chunk in chunks:
+        searchFrom = len(buffer)
+        buffer += chunk
+        start = 0
+
+        while True:
+            end = buffer.find(b"\n", searchFrom)
+            if end == -1:
+                break
+
+            if end - start > maxLength:
+                raise LineTooLong(lineNumber + 1)
+
+            lineNumber += 1
+            yield lineNumber, bytes(buffer[start:end]).rstrip(b"\r")
+            start = searchFrom = end + 1
+
+        del buffer[:start]
+
+        if len(buffer) > maxLength:
+            raise LineTooLong(lineNumber + 1)
+
+    if buffer:
+        yield lineNumber + 1, bytes(buffer).rstrip(b"\r")
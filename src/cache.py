@@ -0,0 +1,54 @@
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+import time
+
+from src.metrics import CacheStats
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries also expire on a deadline.
+
+    Not thread-safe; meant to be used from a single event loop per worker.
+    """
+
+    def __init__(self, maxSize: int) -> None:
+        self.maxSize = maxSize
+        self.stats = CacheStats()
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+
+        if entry is None:
+            self.stats.misses += 1
+            return None
+
+        expiresAt, value = entry
+        if expiresAt <= time.time():
+            del self._entries[key]
+            self.stats.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+
+        return value
+
+    def set(self, key: Hashable, value: Any, expiresAt: float) -> None:
+        if self.maxSize <= 0:
+            return
+
+        self._entries[key] = (expiresAt, value)
+        self._entries.move_to_end(key)
+
+        while len(self._entries) > self.maxSize:
+            self._entries.popitem(last=False)
+
+    def pop(self, key: Hashable) -> None:
+        self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
@@ -2,7 +2,11 @@ from typing import List
 
 from celery import Celery
 from asgiref.sync import async_to_sync
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
 
+from src.books.purge import purgeBook
+from src.config import Config
 from src.mail import mail, createMessage
 
 c_app = Celery()
@@ -15,4 +19,24 @@ def send_email(recipients: List[str], subject: str, body: str):
         recipients=recipients, subject=subject, body=body
     )
 
-    async_to_sync(mail.send_message)(message)
\ No newline at end of file
+    async_to_sync(mail.send_message)(message)
+
+
+@c_app.task(bind=True)
+def purge_book(self, bookUid: str):
+    """Removes a soft-deleted book and everything attached to it, reporting
+    PROGRESS with the running counts after every batch."""
+    engine = create_async_engine(Config.DATABASE_URL, poolclass=NullPool)
+
+    def reportProgress(progress: dict) -> None:
+        self.update_state(state="PROGRESS", meta=progress)
+
+    async def run():
+        try:
+            return await purgeBook(
+                engine, bookUid, Config.BOOK_PURGE_BATCH_SIZE, reportProgress
+            )
+        finally:
+            await engine.dispose()
+
+    return async_to_sync(run)()
@@ -1,7 +1,11 @@
+from typing import Literal, Optional
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     DATABASE_URL: str
+    DATABASE_REPLICA_URL: Optional[str] = None
+    READ_YOUR_WRITES_TTL: int = 5
     JWT_SECRET: str
     JWT_ALGORITHM: str
     REDIS_URL: str = "redis://localhost:6379/0"
@@ -16,6 +20,40 @@ class Settings(BaseSettings):
     USE_CREDENTIALS: bool = True
     VALIDATE_CERTS: bool = True
     DOMAIN: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30
+    DB_POOL_RECYCLE: int = 1800
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_CACHE_SIZE: int = 100
+    N_PLUS_ONE_THRESHOLD: int = 10
+    N_PLUS_ONE_ACTION: Literal["warn", "raise"] = "warn"
+    SLOW_QUERY_ENABLED: bool = False
+    SLOW_QUERY_THRESHOLD_MS: float = 200
+    SLOW_QUERY_EXPLAIN_RATE: float = 0.1
+    SLOW_QUERY_MAX_EXPLAINS: int = 2
+    SLOW_QUERY_BUFFER_SIZE: int = 100
+    BOOK_CACHE_TTL: int = 300
+    TAG_FACETS_CACHE_TTL: int = 60
+    TAG_INDEX_ENABLED: bool = True
+    TAG_INDEX_FALLBACK_LAG: float = 5
+    TAG_FILTER_MAX_UIDS: int = 10000
+    BULK_INSERT_BATCH_SIZE: int = 5000
+    BULK_MAX_LINE_LENGTH: int = 1024 * 1024
+    BOOK_PURGE_BATCH_SIZE: int = 1000
+    AUTH_USER_CACHE_TTL: int = 60
+    AUTH_USER_LOCAL_TTL: float = 5
+    AUTH_USER_LOCAL_SIZE: int = 10000
+    REVOCATION_FALLBACK_LAG: float = 5
+    JWT_CACHE_SIZE: int = 10000
+    PASSWORD_HASH_EXECUTOR: Literal["process", "thread"] = "process"
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 32
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN_PER_IP: str = "20/minute"
+    RATE_LIMIT_LOGIN_PER_EMAIL: str = "5/minute"
+    RATE_LIMIT_SIGNUP_PER_IP: str = "5/minute"
+    RATE_LIMIT_SIGNUP_PER_EMAIL: str = "3/hour"
     
     model_config = SettingsConfigDict(
         env_file=".env",
@@ -0,0 +1,209 @@
+from collections import Counter, deque
+from contextvars import Context, ContextVar
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+import asyncio
+import logging
+import random
+import re
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from src.config import Config
+
+LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|\$\d+|%\(\w+\)s|\?")
+PLACEHOLDER_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+WHITESPACE = re.compile(r"\s+")
+EXPLAINABLE = ("SELECT", "WITH", "INSERT", "UPDATE", "DELETE")
+
+
+class NPlusOneQuery(RuntimeError):
+    """The same statement ran more often in one request than N_PLUS_ONE_THRESHOLD"""
+
+    pass
+
+
+def fingerprint(statement: str) -> str:
+    """Reduces a statement to its shape: literals, bind markers and IN lists
+    are replaced with placeholders so repeated per-row queries compare equal.
+    """
+    normalized = LITERALS.sub("?", statement)
+    normalized = PLACEHOLDER_LISTS.sub("(?)", normalized)
+
+    return WHITESPACE.sub(" ", normalized).strip()
+
+
+class QueryStats:
+    """Queries issued while serving one request."""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.totalTime = 0.0
+        self.fingerprints: Counter = Counter()
+
+    def record(self, statement: str, duration: float) -> int:
+        """Counts one query and returns how often its shape has run so far."""
+        key = fingerprint(statement)
+
+        self.count += 1
+        self.totalTime += duration
+        self.fingerprints[key] += 1
+
+        return self.fingerprints[key]
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [
+            (key, count)
+            for key, count in self.fingerprints.most_common()
+            if count >= threshold
+        ]
+
+    def serverTiming(self) -> str:
+        return f'db;dur={self.totalTime * 1000:.2f};desc="{self.count} queries"'
+
+
+def parameterShape(parameters):
+    """Describes bound parameters by type only, so no values are retained."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return {"rows": len(parameters), "row": parameterShape(parameters[0])}
+
+        return [type(value).__name__ for value in parameters]
+
+    return type(parameters).__name__
+
+
+class SlowQueryLog:
+    """Bounded ring buffer of statements slower than SLOW_QUERY_THRESHOLD_MS.
+
+    A SLOW_QUERY_EXPLAIN_RATE fraction of them is explained in the background
+    on a separate pooled connection, outside the request's query stats; the
+    plan is attached to the entry once it arrives. Slow queries cluster in
+    latency spikes, so an EXPLAIN is skipped while SLOW_QUERY_MAX_EXPLAINS
+    are already running or the pool has no idle connection to lend it.
+    """
+
+    def __init__(self, size: int) -> None:
+        self.entries = deque(maxlen=size)
+        self.skippedExplains = 0
+        self._tasks = set()
+
+    def observe(
+        self,
+        engine: Engine,
+        statement: str,
+        parameters,
+        duration: float,
+        executemany: bool = False,
+    ) -> None:
+        entry = {
+            "sql": fingerprint(statement),
+            "parameters": parameterShape(parameters),
+            "duration_ms": round(duration * 1000, 3),
+            "recorded_at": datetime.now(timezone.utc).isoformat(),
+            "plan": None,
+        }
+        self.entries.append(entry)
+
+        explainable = statement.lstrip().upper().startswith(EXPLAINABLE)
+        if executemany or not explainable:
+            return
+
+        if random.random() >= Config.SLOW_QUERY_EXPLAIN_RATE:
+            return
+
+        if not self.canExplain(engine):
+            self.skippedExplains += 1
+            return
+
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+
+        task = loop.create_task(
+            self.explain(engine, statement, parameters, entry), context=Context()
+        )
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def canExplain(self, engine: Engine) -> bool:
+        if len(self._tasks) >= Config.SLOW_QUERY_MAX_EXPLAINS:
+            return False
+
+        idleConnections = getattr(engine.pool, "checkedin", None)
+
+        return idleConnections is not None and idleConnections() > 0
+
+    async def explain(
+        self, engine: Engine, statement: str, parameters, entry: dict
+    ) -> None:
+        try:
+            async with AsyncEngine(engine).connect() as conn:
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {statement}", parameters
+                )
+                entry["plan"] = result.scalar()
+        except Exception as e:
+            logging.warning("Could not explain slow query: %s", e)
+
+    def snapshot(self) -> List[dict]:
+        return list(reversed(self.entries))
+
+
+slowQueryLog = SlowQueryLog(size=Config.SLOW_QUERY_BUFFER_SIZE)
+
+currentQueryStats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "currentQueryStats", default=None
+)
+
+
+def beforeCursorExecute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("queryStartTimes", []).append(time.perf_counter())
+
+
+def afterCursorExecute(conn, cursor, statement, parameters, context, executemany):
+    duration = time.perf_counter() - conn.info["queryStartTimes"].pop()
+
+    if (
+        Config.SLOW_QUERY_ENABLED
+        and duration * 1000 >= Config.SLOW_QUERY_THRESHOLD_MS
+        and not statement.startswith("EXPLAIN")
+    ):
+        slowQueryLog.observe(
+            conn.engine, statement, parameters, duration, executemany
+        )
+
+    stats = currentQueryStats.get()
+
+    if stats is None:
+        return
+
+    repeats = stats.record(statement, duration)
+    threshold = Config.N_PLUS_ONE_THRESHOLD
+
+    if threshold and Config.N_PLUS_ONE_ACTION == "raise" and repeats == threshold:
+        raise NPlusOneQuery(
+            f"statement ran {repeats} times in one request: {fingerprint(statement)}"
+        )
+
+
+def handleError(exceptionContext) -> None:
+    conn = exceptionContext.connection
+
+    if conn is not None and conn.info.get("queryStartTimes"):
+        conn.info["queryStartTimes"].pop()
+
+
+def instrumentEngine(engine: AsyncEngine) -> None:
+    syncEngine = engine.sync_engine
+
+    event.listen(syncEngine, "before_cursor_execute", beforeCursorExecute)
+    event.listen(syncEngine, "after_cursor_execute", afterCursorExecute)
+    event.listen(syncEngine, "handle_error", handleError)
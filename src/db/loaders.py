@@ -0,0 +1,161 @@
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+import asyncio
+import uuid
+
+from sqlalchemy import any_, bindparam
+import sqlalchemy.dialects.postgresql as pg
+from sqlmodel import desc, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.db.models import Book, BookTag, Review, Tag
+
+BatchLoad = Callable[[List[Hashable]], Awaitable[Dict[Hashable, Any]]]
+
+
+class DataLoader:
+    """Coalesces the keys requested during one event-loop tick into one batch.
+
+    `batchLoad` receives the de-duplicated keys and returns a dict of results;
+    keys it leaves out resolve to `missing()`. Results are memoized for the
+    lifetime of the loader, so each key is fetched at most once.
+    """
+
+    def __init__(self, batchLoad: BatchLoad, missing: Callable[[], Any] = lambda: None):
+        self.batchLoad = batchLoad
+        self.missing = missing
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self._tasks = set()
+
+    def load(self, key: Hashable) -> asyncio.Future:
+        future = self._futures.get(key)
+
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            self._futures[key] = future
+            self._queue.append(key)
+
+            if len(self._queue) == 1:
+                loop.call_soon(self._dispatch)
+
+        return future
+
+    async def loadMany(self, keys: List[Hashable]) -> List[Any]:
+        return list(await asyncio.gather(*(self.load(key) for key in keys)))
+
+    def clear(self) -> None:
+        self._futures.clear()
+
+    def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        task = asyncio.ensure_future(self._resolve(keys))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _resolve(self, keys: List[Hashable]) -> None:
+        try:
+            results = await self.batchLoad(keys)
+        except Exception as e:
+            for key in keys:
+                self._futures.pop(key).set_exception(e)
+            return
+
+        for key in keys:
+            future = self._futures[key]
+            if not future.done():
+                future.set_result(results.get(key, self.missing()))
+
+
+def uidIn(column, keys: List[uuid.UUID]):
+    return column == any_(bindparam("keys", list(keys), type_=pg.ARRAY(pg.UUID)))
+
+
+def groupBy(rows, key) -> Dict[Hashable, list]:
+    groups = defaultdict(list)
+    for row in rows:
+        groups[key(row)].append(row)
+
+    return groups
+
+
+class Loaders:
+    """Per-session set of relation loaders.
+
+    An AsyncSession cannot run two statements at once, so batches from
+    different loaders are serialized on one lock.
+    """
+
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+        self.lock = asyncio.Lock()
+        self.reviewsByBook = DataLoader(self.loadReviewsByBook, missing=list)
+        self.tagsByBook = DataLoader(self.loadTagsByBook, missing=list)
+        self.booksByUser = DataLoader(self.loadBooksByUser, missing=list)
+        self.reviewsByUser = DataLoader(self.loadReviewsByUser, missing=list)
+
+    def clear(self) -> None:
+        for loader in (
+            self.reviewsByBook,
+            self.tagsByBook,
+            self.booksByUser,
+            self.reviewsByUser,
+        ):
+            loader.clear()
+
+    async def fetch(self, statement) -> list:
+        async with self.lock:
+            result = await self.session.exec(statement)
+            return result.all()
+
+    async def loadReviewsByBook(self, bookUids):
+        reviews = await self.fetch(
+            select(Review)
+            .where(uidIn(Review.bookUid, bookUids))
+            .order_by(desc(Review.created_at))
+        )
+
+        return groupBy(reviews, lambda review: review.bookUid)
+
+    async def loadTagsByBook(self, bookUids):
+        rows = await self.fetch(
+            select(BookTag.bookId, Tag)
+            .join(Tag, Tag.uid == BookTag.tagId)
+            .where(uidIn(BookTag.bookId, bookUids))
+            .order_by(Tag.name)
+        )
+
+        return {
+            bookUid: [tag for _, tag in group]
+            for bookUid, group in groupBy(rows, lambda row: row[0]).items()
+        }
+
+    async def loadBooksByUser(self, userUids):
+        books = await self.fetch(
+            select(Book)
+            .where(uidIn(Book.userUid, userUids), Book.deleted_at.is_(None))
+            .order_by(desc(Book.created_at))
+        )
+
+        return groupBy(books, lambda book: book.userUid)
+
+    async def loadReviewsByUser(self, userUids):
+        reviews = await self.fetch(
+            select(Review)
+            .where(uidIn(Review.userUid, userUids))
+            .order_by(desc(Review.created_at))
+        )
+
+        return groupBy(reviews, lambda review: review.userUid)
+
+
+def getLoaders(session: AsyncSession) -> Loaders:
+    """Returns the loaders bound to `session`, which is request-scoped, so
+    batching and memoization last exactly as long as the request."""
+    loaders = session.info.get("loaders")
+
+    if loaders is None:
+        loaders = session.info["loaders"] = Loaders(session)
+
+    return loaders
@@ -1,11 +1,105 @@
-from sqlmodel import create_engine, SQLModel
-from sqlalchemy.ext.asyncio import AsyncEngine
+from typing import Optional
+import logging
+import time
+
+from fastapi import Request
+from redis.exceptions import RedisError
+from sqlmodel import SQLModel
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from src.auth.utils import decodeToken
 from src.config import Config
+from src.db.instrumentation import instrumentEngine
+from src.db.redis import hasRecentWrite, markRecentWrite
 from sqlmodel.ext.asyncio.session import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 
-asyncEngine = AsyncEngine(create_engine(url=Config.DATABASE_URL))
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long callers wait to check out a connection."""
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.totalWait = 0.0
+        self.maxWait = 0.0
+
+    def connect(self):
+        startTime = time.perf_counter()
+
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - startTime
+            self.checkouts += 1
+            self.totalWait += waited
+            self.maxWait = max(self.maxWait, waited)
+
+    def stats(self) -> dict:
+        averageWait = self.totalWait / self.checkouts if self.checkouts else 0.0
+
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "connections": self.size() + self.overflow(),
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(1000 * averageWait, 3),
+            "max_wait_ms": round(1000 * self.maxWait, 3),
+        }
+
+
+def engineOptions(url: str) -> dict:
+    options = {
+        "poolclass": InstrumentedPool,
+        "pool_size": Config.DB_POOL_SIZE,
+        "max_overflow": Config.DB_MAX_OVERFLOW,
+        "pool_timeout": Config.DB_POOL_TIMEOUT,
+        "pool_recycle": Config.DB_POOL_RECYCLE,
+        "pool_pre_ping": Config.DB_POOL_PRE_PING,
+    }
+
+    if make_url(url).get_driver_name() == "asyncpg":
+        options["connect_args"] = {
+            "prepared_statement_cache_size": Config.DB_STATEMENT_CACHE_SIZE
+        }
+
+    return options
+
+
+asyncEngine = create_async_engine(
+    Config.DATABASE_URL, **engineOptions(Config.DATABASE_URL)
+)
+
+sessionFactory = sessionmaker(
+    bind=asyncEngine, class_=AsyncSession, expire_on_commit=False
+)
+
+if Config.DATABASE_REPLICA_URL:
+    replicaEngine = create_async_engine(
+        Config.DATABASE_REPLICA_URL, **engineOptions(Config.DATABASE_REPLICA_URL)
+    )
+    replicaSessionFactory = sessionmaker(
+        bind=replicaEngine, class_=AsyncSession, expire_on_commit=False
+    )
+else:
+    replicaEngine = asyncEngine
+    replicaSessionFactory = sessionFactory
+
+instrumentEngine(asyncEngine)
+if replicaEngine is not asyncEngine:
+    instrumentEngine(replicaEngine)
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
 
 
 async def initDb() -> None:
@@ -15,10 +109,66 @@ async def initDb() -> None:
         await conn.run_sync(SQLModel.metadata.create_all)
 
 
-async def getSession():
-    Session = sessionmaker(
-        bind=asyncEngine, class_=AsyncSession, expire_on_commit=False
-    )
+def requestUserKey(request: Request) -> Optional[str]:
+    """Identifies the caller from the bearer token, if there is a valid one."""
+    tokenData = getattr(request.state, "tokenData", None)
+
+    if tokenData is None:
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return None
+
+        tokenData = decodeToken(token)
+        if tokenData is None:
+            return None
+
+    user = tokenData.get("user", {})
+
+    return user.get("userUid") or user.get("email")
+
+
+async def readsFromReplica(userKey: Optional[str]) -> bool:
+    """Reads go to the replica unless the caller has just written."""
+    if replicaSessionFactory is sessionFactory:
+        return False
+
+    if userKey is None:
+        return True
+
+    try:
+        return not await hasRecentWrite(userKey)
+    except RedisError as e:
+        logging.exception(e)
+        return False
+
+
+async def getSession(request: Request):
+    """Session on the primary. Callers that send an unsafe request are
+    marked as recent writers, so their reads stay on the primary for
+    READ_YOUR_WRITES_TTL seconds."""
+    userKey = requestUserKey(request)
+
+    async with sessionFactory() as session:
+        try:
+            yield session
+        finally:
+            if userKey is not None and request.method not in SAFE_METHODS:
+                try:
+                    await markRecentWrite(userKey, Config.READ_YOUR_WRITES_TTL)
+                except RedisError as e:
+                    logging.exception(e)
+
+
+async def getReadSession(request: Request):
+    """Session for routes that never write, on the replica when one is
+    configured and the caller has not just written.
+
+    `session.info["replica"]` tells services whether what they read may
+    lag the primary, e.g. so it is not written back to shared caches.
+    """
+    useReplica = await readsFromReplica(requestUserKey(request))
+    factory = replicaSessionFactory if useReplica else sessionFactory
 
-    async with Session() as session:
+    async with factory() as session:
+        session.info["replica"] = useReplica
         yield session
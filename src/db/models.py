@@ -1,10 +1,19 @@
 from typing import List, Optional
 
-from sqlmodel import SQLModel, Field, Column, Relationship
+from sqlmodel import SQLModel, Field, Column, Relationship, Index
+from sqlalchemy import Computed, ForeignKey
 import sqlalchemy.dialects.postgresql as pg
 from datetime import datetime, date
 import uuid
 
+SEARCH_CONFIG = "simple"
+
+SEARCH_VECTOR_EXPRESSION = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(author, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(publisher, '')), 'C')"
+)
+
 
 class BookTag(SQLModel, table=True):
     bookId: uuid.UUID = Field(default=None, foreign_key="books.uid", primary_key=True)
@@ -13,15 +22,23 @@ class BookTag(SQLModel, table=True):
 
 class Tag(SQLModel, table=True):
     __tablename__ = "tags"
+    __table_args__ = (
+        Index("ix_tags_name", "name", unique=True),
+        Index("ix_tags_book_count", "book_count"),
+    )
+
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
     )
     name: str = Field(sa_column=Column(pg.VARCHAR, nullable=False))
+    book_count: int = Field(
+        sa_column=Column(pg.INTEGER, nullable=False, default=0, server_default="0")
+    )
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     books: List["Book"] = Relationship(
         link_model=BookTag,
         back_populates="tags",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": "raise_on_sql"},
     )
 
     def __repr__(self) -> str:
@@ -43,13 +60,17 @@ class User(SQLModel, table=True):
     )
     isVerified: bool = Field(default=False)
     passwordHash: str = Field(exclude=True)
+    version: int = Field(
+        default=1,
+        sa_column=Column(pg.INTEGER, nullable=False, default=1, server_default="1"),
+    )
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     books: List["Book"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user", sa_relationship_kwargs={"lazy": "raise_on_sql"}
     )
     reviews: List["Review"] = Relationship(
-        back_populates="user", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="user", sa_relationship_kwargs={"lazy": "raise_on_sql"}
     )
 
     def __repr__(self):
@@ -58,6 +79,23 @@ class User(SQLModel, table=True):
 
 class Book(SQLModel, table=True):
     __tablename__ = "books"
+    __table_args__ = (
+        Index("ix_books_created_at_uid", "created_at", "uid"),
+        Index("ix_books_userUid_created_at_uid", "userUid", "created_at", "uid"),
+        Index("ix_books_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_books_title_trgm",
+            "title",
+            postgresql_using="gin",
+            postgresql_ops={"title": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_books_author_trgm",
+            "author",
+            postgresql_using="gin",
+            postgresql_ops={"author": "gin_trgm_ops"},
+        ),
+    )
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
@@ -69,16 +107,32 @@ class Book(SQLModel, table=True):
     page_count: int
     language: str
     userUid: Optional[uuid.UUID] = Field(default=None, foreign_key="users.uid")
+    version: int = Field(
+        default=1,
+        sa_column=Column(pg.INTEGER, nullable=False, default=1, server_default="1"),
+    )
     created_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
     updated_at: datetime = Field(sa_column=Column(pg.TIMESTAMP, default=datetime.now))
-    user: Optional[User] = Relationship(back_populates="books")
+    deleted_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(pg.TIMESTAMP, nullable=True)
+    )
+    search_vector: Optional[str] = Field(
+        default=None,
+        exclude=True,
+        sa_column=Column(
+            pg.TSVECTOR, Computed(SEARCH_VECTOR_EXPRESSION, persisted=True)
+        ),
+    )
+    user: Optional[User] = Relationship(
+        back_populates="books", sa_relationship_kwargs={"lazy": "raise_on_sql"}
+    )
     reviews: List["Review"] = Relationship(
-        back_populates="book", sa_relationship_kwargs={"lazy": "selectin"}
+        back_populates="book", sa_relationship_kwargs={"lazy": "raise_on_sql"}
     )
     tags: List[Tag] = Relationship(
         link_model=BookTag,
         back_populates="books",
-        sa_relationship_kwargs={"lazy": "selectin"},
+        sa_relationship_kwargs={"lazy": "raise_on_sql"},
     )
 
     def __repr__(self):
@@ -87,6 +141,7 @@ class Book(SQLModel, table=True):
 
 class Review(SQLModel, table=True):
     __tablename__ = "reviews"
+    __table_args__ = (Index("ix_reviews_bookUid", "bookUid"),)
 
     uid: uuid.UUID = Field(
         sa_column=Column(pg.UUID, nullable=False, primary_key=True, default=uuid.uuid4)
@@ -102,3 +157,26 @@ class Review(SQLModel, table=True):
 
     def __repr__(self):
         return f"<Review for book {self.bookUid} by user {self.userUid}>"
+
+
+class BookRatingStats(SQLModel, table=True):
+    __tablename__ = "book_rating_stats"
+
+    bookUid: uuid.UUID = Field(
+        sa_column=Column(
+            pg.UUID,
+            ForeignKey("books.uid", ondelete="CASCADE"),
+            nullable=False,
+            primary_key=True,
+        )
+    )
+    rating_count: int = Field(default=0)
+    rating_sum: int = Field(default=0)
+    rating_1: int = Field(default=0)
+    rating_2: int = Field(default=0)
+    rating_3: int = Field(default=0)
+    rating_4: int = Field(default=0)
+    rating_5: int = Field(default=0)
+
+    def __repr__(self):
+        return f"<BookRatingStats for book {self.bookUid}>"
@@ -0,0 +1,122 @@
+from typing import Optional
+import asyncio
+import json
+import logging
+import time
+
+from redis.exceptions import RedisError
+from sqlalchemy.exc import SQLAlchemyError
+
+from src.db.redis import publishEvent, redisClient
+
+POLL_TIMEOUT = 1.0
+RECONNECT_DELAY = 1.0
+
+
+class ChannelMirror:
+    """Base for per-worker state kept in step over a Redis pub/sub channel.
+
+    Writers call `publish` after committing: the event is applied here and
+    sent to the other workers, which apply it in `apply` as it arrives. A
+    worker subscribes before `seed` loads the current state from the
+    database, so no event published in between is missed; `apply` must
+    therefore tolerate events the seed already reflects. Readers should
+    check `isCurrent` and fall back to the database while the mirror is not
+    seeded, disconnected, or has not polled the channel for `maxLag`
+    seconds.
+    """
+
+    channel: str
+    enabled = True
+    maxLag = 5.0
+
+    def __init__(self) -> None:
+        self._task: Optional[asyncio.Task] = None
+        self._pubsub = None
+        self.ready = False
+        self.lastPolledAt = 0.0
+
+    async def seed(self) -> None:
+        raise NotImplementedError
+
+    def apply(self, event: dict) -> None:
+        raise NotImplementedError
+
+    def decode(self, data: bytes) -> dict:
+        """The event carried by a channel message, JSON by default."""
+        return json.loads(data)
+
+    def polled(self) -> None:
+        """Called after every poll of the channel, e.g. for housekeeping."""
+
+    def isCurrent(self) -> bool:
+        lag = time.monotonic() - self.lastPolledAt
+
+        return self.ready and lag <= self.maxLag
+
+    async def publish(self, event: dict) -> None:
+        if not self.enabled:
+            return
+
+        self.apply(event)
+
+        try:
+            await publishEvent(self.channel, event)
+        except RedisError as e:
+            logging.exception(e)
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        await self._disconnect()
+
+    async def _connect(self) -> None:
+        self._pubsub = redisClient.pubsub(ignore_subscribe_messages=True)
+        await self._pubsub.subscribe(self.channel)
+
+        await self.seed()
+        self.ready = True
+
+    async def _disconnect(self) -> None:
+        self.ready = False
+
+        if self._pubsub is not None:
+            try:
+                await self._pubsub.aclose()
+            except RedisError as e:
+                logging.exception(e)
+            self._pubsub = None
+
+    def _handle(self, data: bytes) -> None:
+        try:
+            self.apply(self.decode(data))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            logging.warning("Malformed %s message: %r", self.channel, data)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                if self._pubsub is None:
+                    await self._connect()
+
+                message = await self._pubsub.get_message(timeout=POLL_TIMEOUT)
+                self.lastPolledAt = time.monotonic()
+
+                if message is not None and message["type"] == "message":
+                    self._handle(message["data"])
+
+                self.polled()
+            except (RedisError, OSError, SQLAlchemyError) as e:
+                logging.exception(e)
+                await self._disconnect()
+                await asyncio.sleep(RECONNECT_DELAY)
@@ -1,18 +1,300 @@
+from typing import AsyncIterator, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import time
+import uuid
+
 from redis import asyncio as aioredis
 from src.config import Config
 
 JTI_EXPIRY = 3600
+BLOCKLIST_PREFIX = "blocklist:"
+BLOCKLIST_CHANNEL = "blocklist"
+BOOK_VERSION_EXPIRY = 7 * 24 * 3600
+TAGS_VERSION_KEY = "tags:version"
+TAG_INDEX_CHANNEL = "tagindex"
+SUGGESTION_CHANNEL = "suggestions"
+
+redisClient = aioredis.from_url(Config.REDIS_URL)
+
+def blocklistKey(jti: str) -> str:
+    return f"{BLOCKLIST_PREFIX}{jti}"
+
+
+async def addJtiToBlocklist(jti: str, exp: Optional[int] = None) -> None:
+    """Revokes a token until its `exp` and tells every worker about it."""
+    if exp is None:
+        exp = int(time.time()) + JTI_EXPIRY
+
+    ttl = max(int(exp - time.time()), 1)
+
+    async with redisClient.pipeline(transaction=False) as pipe:
+        pipe.set(name=blocklistKey(jti), value=exp, ex=ttl)
+        pipe.publish(BLOCKLIST_CHANNEL, f"{jti} {exp}")
+
+        await pipe.execute()
 
-tokenBlocklist = aioredis.from_url(Config.REDIS_URL)
 
-async def addJtiToBlocklist(jti: str) -> None:
-    await tokenBlocklist.set(
-        name=jti,
-        value="",
-        ex=JTI_EXPIRY
-    )
-    
 async def tokenInBlocklist(jti: str) -> bool:
-    jti = await tokenBlocklist.get(jti)
-    
-    return jti is not None
\ No newline at end of file
+    jti = await redisClient.get(blocklistKey(jti))
+
+    return jti is not None
+
+
+async def scanBlocklist(batchSize: int = 1000) -> AsyncIterator[Tuple[str, int]]:
+    """Yields (jti, exp) for every token currently on the blocklist."""
+    keys = []
+
+    async for key in redisClient.scan_iter(match=f"{BLOCKLIST_PREFIX}*", count=batchSize):
+        keys.append(key)
+
+        if len(keys) >= batchSize:
+            for entry in await _readBlocklist(keys):
+                yield entry
+            keys = []
+
+    if keys:
+        for entry in await _readBlocklist(keys):
+            yield entry
+
+
+async def _readBlocklist(keys: List[bytes]) -> List[Tuple[str, int]]:
+    values = await redisClient.mget(keys)
+    prefixLength = len(BLOCKLIST_PREFIX)
+
+    return [
+        (key.decode()[prefixLength:], int(value))
+        for key, value in zip(keys, values)
+        if value
+    ]
+
+
+def bookVersionKey(bookUid: str) -> str:
+    return f"book:{bookUid}:version"
+
+
+def bookDetailKey(bookUid: str) -> str:
+    return f"book:{bookUid}:detail"
+
+
+def newVersion() -> str:
+    return uuid.uuid4().hex
+
+
+async def getCachedBooks(
+    bookUids: List[str],
+) -> List[Tuple[Optional[str], Optional[bytes]]]:
+    """Returns the current version stamp and cached payload of each book.
+
+    A payload is only returned when it was written under the current
+    version, so a write-back that raced with an invalidation is ignored.
+    Books without a stamp come back as (None, None); reading never creates
+    one, so lookups of unknown uids leave nothing behind in Redis.
+    """
+    keys = []
+    for bookUid in bookUids:
+        keys.extend((bookVersionKey(bookUid), bookDetailKey(bookUid)))
+
+    values = await redisClient.mget(keys)
+    results = []
+
+    for position in range(len(bookUids)):
+        version, cached = values[2 * position], values[2 * position + 1]
+
+        if version is None:
+            results.append((None, None))
+            continue
+
+        version = version.decode()
+        payload = None
+
+        if cached is not None:
+            cachedVersion, _, body = cached.partition(b"\n")
+            if cachedVersion.decode() == version:
+                payload = body
+
+        results.append((version, payload))
+
+    return results
+
+
+async def createBookVersions(bookUids: List[str]) -> List[Optional[str]]:
+    """Stamps books that have no version yet, for callers that have just
+    found them in the database. A book stamped by someone else in the
+    meantime, e.g. by an invalidation, gets None and must not be cached."""
+    versions = [newVersion() for _ in bookUids]
+
+    async with redisClient.pipeline(transaction=False) as pipe:
+        for bookUid, version in zip(bookUids, versions):
+            pipe.set(bookVersionKey(bookUid), version, ex=BOOK_VERSION_EXPIRY, nx=True)
+        created = await pipe.execute()
+
+    return [
+        version if wasCreated else None
+        for version, wasCreated in zip(versions, created)
+    ]
+
+
+async def setCachedBooks(entries: Iterable[Tuple[str, str, str]], ttl: int) -> None:
+    async with redisClient.pipeline(transaction=False) as pipe:
+        for bookUid, version, payload in entries:
+            pipe.set(bookDetailKey(bookUid), f"{version}\n{payload}", ex=ttl)
+
+        await pipe.execute()
+
+
+async def bumpBookVersions(bookUids: Iterable[str]) -> None:
+    async with redisClient.pipeline(transaction=False) as pipe:
+        for bookUid in bookUids:
+            pipe.set(bookVersionKey(bookUid), newVersion(), ex=BOOK_VERSION_EXPIRY)
+            pipe.delete(bookDetailKey(bookUid))
+
+        await pipe.execute()
+
+
+async def getVersion(key: str) -> Optional[str]:
+    version = await redisClient.get(key)
+
+    return version.decode() if version is not None else None
+
+
+async def createVersion(key: str) -> Optional[str]:
+    """Creates the version stamp at `key` if there is none.
+
+    Returns None when the stamp already existed, e.g. because a concurrent
+    request or an invalidation created it first.
+    """
+    version = newVersion()
+    created = await redisClient.set(key, version, ex=BOOK_VERSION_EXPIRY, nx=True)
+
+    return version if created else None
+
+
+async def bumpVersion(key: str) -> None:
+    await redisClient.set(key, newVersion(), ex=BOOK_VERSION_EXPIRY)
+
+
+def tagFacetsKey(version: str, scope: str) -> str:
+    digest = hashlib.sha1(scope.encode()).hexdigest()
+
+    return f"tags:facets:{version}:{digest}"
+
+
+async def getCachedFacets(key: str) -> Optional[bytes]:
+    return await redisClient.get(key)
+
+
+async def setCachedFacets(key: str, payload: str, ttl: int) -> None:
+    await redisClient.set(key, payload, ex=ttl)
+
+
+async def publishEvent(channel: str, event: dict) -> None:
+    await redisClient.publish(channel, json.dumps(event))
+
+
+def recentWriteKey(userKey: str) -> str:
+    return f"recentwrite:{userKey}"
+
+
+async def markRecentWrite(userKey: str, ttl: int) -> None:
+    await redisClient.set(recentWriteKey(userKey), "", ex=ttl)
+
+
+async def hasRecentWrite(userKey: str) -> bool:
+    return await redisClient.exists(recentWriteKey(userKey)) > 0
+
+
+def authUserKey(email: str) -> str:
+    return f"authuser:{email}"
+
+
+def authUserVersionKey(email: str) -> str:
+    return f"authuser:{email}:version"
+
+
+async def getCachedAuthUser(email: str) -> Tuple[Optional[str], Optional[bytes]]:
+    """Returns the user's version stamp and the projection cached under it,
+    with the same rules as getCachedBooks."""
+    version, cached = await redisClient.mget(
+        authUserVersionKey(email), authUserKey(email)
+    )
+
+    if version is None:
+        return None, None
+
+    version = version.decode()
+
+    if cached is not None:
+        cachedVersion, _, body = cached.partition(b"\n")
+        if cachedVersion.decode() == version:
+            return version, body
+
+    return version, None
+
+
+async def createAuthUserVersion(email: str) -> Optional[str]:
+    return await createVersion(authUserVersionKey(email))
+
+
+async def setCachedAuthUser(email: str, version: str, payload: str, ttl: int) -> None:
+    await redisClient.set(authUserKey(email), f"{version}\n{payload}", ex=ttl)
+
+
+async def bumpAuthUserVersion(email: str) -> None:
+    async with redisClient.pipeline(transaction=False) as pipe:
+        pipe.set(authUserVersionKey(email), newVersion(), ex=BOOK_VERSION_EXPIRY)
+        pipe.delete(authUserKey(email))
+
+        await pipe.execute()
+
+
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3])
+
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(bucket[1])
+local ts = tonumber(bucket[2])
+
+if tokens == nil or ts == nil then
+    tokens = capacity
+    ts = now
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local retryAfter = 0
+if tokens >= cost then
+    tokens = tokens - cost
+else
+    retryAfter = math.ceil((cost - tokens) / rate)
+end
+
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 1000)
+
+return retryAfter
+"""
+
+tokenBucket = redisClient.register_script(TOKEN_BUCKET_SCRIPT)
+
+
+def rateLimitKey(scope: str, identity: str) -> str:
+    return f"ratelimit:{scope}:{identity}"
+
+
+async def takeToken(key: str, capacity: int, period: float, cost: int = 1) -> float:
+    """Takes `cost` tokens from a bucket refilled at `capacity` per `period`.
+
+    Returns 0 when the tokens were granted, otherwise the number of seconds
+    until they will be available. The refill and take happen atomically in
+    Redis, using the Redis clock so all workers agree on elapsed time.
+    """
+    ratePerMs = capacity / (period * 1000)
+    retryAfterMs = await tokenBucket(keys=[key], args=[capacity, ratePerMs, cost])
+
+    return int(retryAfterMs) / 1000
@@ -77,6 +77,47 @@ class UserNotFound(StudyScopeException):
     pass
 
 
+class LineTooLong(StudyScopeException):
+    """User has uploaded a line longer than the bulk ingest limit"""
+
+    def __init__(self, line: int, inserted: int = 0) -> None:
+        super().__init__(line, inserted)
+        self.line = line
+        self.inserted = inserted
+
+
+class InvalidCursor(StudyScopeException):
+    """User has provided a malformed pagination cursor"""
+
+    pass
+
+
+class InvalidTagExpression(StudyScopeException):
+    """User has provided a malformed tag filter expression"""
+
+    pass
+
+
+class VersionConflict(StudyScopeException):
+    """User has tried to update a resource that changed since they read it"""
+
+    pass
+
+
+class ServiceBusy(StudyScopeException):
+    """The server is temporarily unable to take on more work"""
+
+    pass
+
+
+class RateLimitExceeded(StudyScopeException):
+    """User has sent too many requests in a given amount of time"""
+
+    def __init__(self, retryAfter: int) -> None:
+        super().__init__(retryAfter)
+        self.retryAfter = retryAfter
+
+
 class AccountNotVerified(Exception):
     """Account not yet verified"""
 
@@ -232,6 +273,82 @@ def registerAllErrors(app: FastAPI):
         ),
     )
 
+    app.add_exception_handler(
+        InvalidCursor,
+        createExceptionHandler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "message": "Pagination cursor is invalid",
+                "resolution": "Use the next_cursor value returned by the previous page",
+                "error_code": "invalid_cursor",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        InvalidTagExpression,
+        createExceptionHandler(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            initial_detail={
+                "message": "Tag filter expression is invalid",
+                "resolution": "Combine tag names with AND, OR, NOT and parentheses",
+                "error_code": "invalid_tag_expression",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        VersionConflict,
+        createExceptionHandler(
+            status_code=status.HTTP_409_CONFLICT,
+            initial_detail={
+                "message": "Resource was modified by another request",
+                "resolution": "Reload it and retry with the current version",
+                "error_code": "version_conflict",
+            },
+        ),
+    )
+
+    app.add_exception_handler(
+        ServiceBusy,
+        createExceptionHandler(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            initial_detail={
+                "message": "Server is busy",
+                "resolution": "Please try again shortly",
+                "error_code": "service_busy",
+            },
+        ),
+    )
+
+    @app.exception_handler(RateLimitExceeded)
+    async def rateLimitExceeded(request: Request, exc: RateLimitExceeded):
+
+        return JSONResponse(
+            content={
+                "message": "Too many requests",
+                "resolution": f"Please try again in {exc.retryAfter} seconds",
+                "error_code": "rate_limited",
+            },
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            headers={"Retry-After": str(exc.retryAfter)},
+        )
+
+    @app.exception_handler(LineTooLong)
+    async def lineTooLong(request: Request, exc: LineTooLong):
+
+        return JSONResponse(
+            content={
+                "message": f"Line {exc.line} of the upload is too long",
+                "resolution": f"Keep lines under the ingest limit; the first "
+                f"{exc.inserted} valid rows before it were already saved",
+                "error_code": "line_too_long",
+                "line": exc.line,
+                "inserted": exc.inserted,
+            },
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
     @app.exception_handler(500)
     async def internal_server_error(request, exc):
 
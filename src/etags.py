@@ -0,0 +1,31 @@
+from typing import Optional
+
+from fastapi import Response, status
+
+
+def makeEtag(version: str) -> str:
+    return f'"{version}"'
+
+
+def etagMatches(ifNoneMatch: Optional[str], etag: str) -> bool:
+    """Weak comparison of an If-None-Match header against `etag`."""
+    if not ifNoneMatch:
+        return False
+
+    if ifNoneMatch.strip() == "*":
+        return True
+
+    for candidate in ifNoneMatch.split(","):
+        candidate = candidate.strip()
+
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+
+        if candidate == etag:
+            return True
+
+    return False
+
+
+def notModified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
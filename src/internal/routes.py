@@ -0,0 +1,38 @@
+from fastapi import APIRouter, Depends
+
+from src.auth.dependencies import RoleChecker
+from src.auth.utils import tokenCache
+from src.books.service import bookCacheStats
+from src.db.instrumentation import slowQueryLog
+from src.db.main import asyncEngine
+from src.tags.bitmap import tagIndex
+
+
+internalRouter = APIRouter()
+adminRoleChecker = Depends(RoleChecker(["admin"]))
+
+
+@internalRouter.get("/cache", dependencies=[adminRoleChecker])
+async def getCacheStats():
+    return {
+        "book_detail": bookCacheStats.asDict(),
+        "jwt": tokenCache.stats.asDict(),
+    }
+
+
+@internalRouter.get("/db/pool", dependencies=[adminRoleChecker])
+async def getPoolStats():
+    return asyncEngine.pool.stats()
+
+
+@internalRouter.get("/db/slow-queries", dependencies=[adminRoleChecker])
+async def getSlowQueries():
+    return {
+        "queries": slowQueryLog.snapshot(),
+        "skipped_explains": slowQueryLog.skippedExplains,
+    }
+
+
+@internalRouter.get("/tags/index", dependencies=[adminRoleChecker])
+async def getTagIndexStats():
+    return tagIndex.stats()
@@ -7,6 +7,9 @@ from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 
+from src.config import Config
+from src.db.instrumentation import QueryStats, currentQueryStats
+
 
 logger = logging.getLogger("uvicorn.access")
 logger.disabled = True
@@ -17,13 +20,33 @@ def registerMiddleware(app: FastAPI):
     @app.middleware("http")
     async def customLogging(request: Request, callNext):
         startTime = time.time()
+        queryStats = QueryStats()
+        token = currentQueryStats.set(queryStats)
+
+        try:
+            response = await callNext(request)
+        finally:
+            currentQueryStats.reset(token)
 
-        response = await callNext(request)
         processingTime = time.time() - startTime
 
-        message = f"{request.client.host}:{request.client.port} - {request.method} - {request.url.path} - {response.status_code} - completed after {processingTime} s"
+        response.headers["Server-Timing"] = (
+            f"{queryStats.serverTiming()}, total;dur={processingTime * 1000:.2f}"
+        )
+
+        message = f"{request.client.host}:{request.client.port} - {request.method} - {request.url.path} - {response.status_code} - completed after {processingTime} s - {queryStats.count} queries in {queryStats.totalTime} s"
         print(message)
 
+        if Config.N_PLUS_ONE_THRESHOLD:
+            for statement, count in queryStats.repeated(Config.N_PLUS_ONE_THRESHOLD):
+                logging.warning(
+                    "Possible N+1 in %s %s: statement ran %d times: %s",
+                    request.method,
+                    request.url.path,
+                    count,
+                    statement,
+                )
+
         return response
 
     app.add_middleware(
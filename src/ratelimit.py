@@ -0,0 +1,70 @@
+from typing import Optional, Tuple
+import logging
+import math
+
+from fastapi import Request
+from redis.exceptions import RedisError
+
+from src.config import Config
+from src.db.redis import rateLimitKey, takeToken
+from src.errors import RateLimitExceeded
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parseRate(rate: str) -> Tuple[int, int]:
+    """Parses a limit such as "5/minute" into (capacity, period in seconds)."""
+    count, _, period = rate.partition("/")
+
+    return int(count), PERIODS[period.strip()]
+
+
+class RateLimiter:
+    """Route dependency that throttles callers with Redis token buckets.
+
+    Buckets are kept per client IP and, when `perEmail` is set, per email
+    address found in the JSON request body. Redis errors let the request
+    through rather than locking everyone out.
+    """
+
+    def __init__(self, scope: str, perIp: str, perEmail: Optional[str] = None) -> None:
+        self.scope = scope
+        self.perIp = parseRate(perIp)
+        self.perEmail = parseRate(perEmail) if perEmail else None
+
+    async def __call__(self, request: Request) -> None:
+        if not Config.RATE_LIMIT_ENABLED:
+            return
+
+        buckets = [(f"{self.scope}:ip", request.client.host, self.perIp)]
+
+        if self.perEmail is not None:
+            email = await self.getEmail(request)
+            if email:
+                buckets.append((f"{self.scope}:email", email, self.perEmail))
+
+        retryAfter = 0.0
+
+        try:
+            for scope, identity, (capacity, period) in buckets:
+                waitFor = await takeToken(rateLimitKey(scope, identity), capacity, period)
+                retryAfter = max(retryAfter, waitFor)
+        except RedisError as e:
+            logging.exception(e)
+            return
+
+        if retryAfter > 0:
+            raise RateLimitExceeded(retryAfter=math.ceil(retryAfter))
+
+    async def getEmail(self, request: Request) -> Optional[str]:
+        try:
+            body = await request.json()
+        except ValueError:
+            return None
+
+        email = body.get("email") if isinstance(body, dict) else None
+
+        if not isinstance(email, str):
+            return None
+
+        return email.strip().casefold()
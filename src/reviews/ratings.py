@@ -0,0 +1,142 @@
+"""Incrementally maintained per-book rating aggregates.
+
+`book_rating_stats` keeps a count, a sum and a 1-5 histogram per book.
+Reviews written before ratings were required to be at least 1 may hold 0 or
+less; they count towards `rating_count` and `rating_sum`, as in the backfill,
+but have no histogram bucket. The review service applies ratingIncrement/ratingDecrement in the same
+transaction as the review write; rebuildRatingStats recomputes everything
+from `reviews` and can be run as a backfill with
+
+    python -m src.reviews.ratings
+"""
+from typing import Optional
+import asyncio
+import uuid
+
+from sqlmodel import select, update, func, cast, Float
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.dialects.postgresql import insert
+
+from src.db.models import BookRatingStats, Review
+
+RATINGS = (1, 2, 3, 4, 5)
+COUNTER_COLUMNS = ("rating_count", "rating_sum") + tuple(
+    f"rating_{rating}" for rating in RATINGS
+)
+
+
+def histogramColumn(rating: int) -> Optional[str]:
+    return f"rating_{rating}" if rating in RATINGS else None
+
+
+def ratingIncrement(bookUid: uuid.UUID, rating: int):
+    values = {column: 0 for column in COUNTER_COLUMNS}
+    values.update({"rating_count": 1, "rating_sum": rating})
+
+    bucket = histogramColumn(rating)
+    if bucket is not None:
+        values[bucket] = 1
+
+    statement = insert(BookRatingStats).values(bookUid=bookUid, **values)
+
+    return statement.on_conflict_do_update(
+        index_elements=[BookRatingStats.bookUid],
+        set_={
+            column: getattr(BookRatingStats, column) + statement.excluded[column]
+            for column in COUNTER_COLUMNS
+        },
+    )
+
+
+def ratingDecrement(bookUid: uuid.UUID, rating: int):
+    values = {
+        "rating_count": BookRatingStats.rating_count - 1,
+        "rating_sum": BookRatingStats.rating_sum - rating,
+    }
+
+    bucket = histogramColumn(rating)
+    if bucket is not None:
+        values[bucket] = getattr(BookRatingStats, bucket) - 1
+
+    return (
+        update(BookRatingStats)
+        .where(BookRatingStats.bookUid == bookUid)
+        .values(**values)
+    )
+
+
+def ratingCountColumn():
+    return func.coalesce(BookRatingStats.rating_count, 0)
+
+
+def ratingAvgColumn():
+    return cast(BookRatingStats.rating_sum, Float) / cast(
+        func.nullif(BookRatingStats.rating_count, 0), Float
+    )
+
+
+def ratingSortKey():
+    return func.coalesce(ratingAvgColumn(), 0.0)
+
+
+def ratingSummary(stats: Optional[BookRatingStats]) -> dict:
+    if stats is None or stats.rating_count <= 0:
+        return {"rating_count": 0, "rating_avg": None, "rating_histogram": [0] * 5}
+
+    return {
+        "rating_count": stats.rating_count,
+        "rating_avg": stats.rating_sum / stats.rating_count,
+        "rating_histogram": [getattr(stats, f"rating_{rating}") for rating in RATINGS],
+    }
+
+
+async def rebuildRatingStats(session: AsyncSession) -> None:
+    """Recomputes every book's aggregates from `reviews` in one transaction.
+
+    Review writes are blocked while it runs so no increment is lost.
+    """
+    await session.exec(text("LOCK TABLE reviews IN SHARE MODE"))
+
+    aggregates = (
+        select(
+            Review.bookUid,
+            func.count(),
+            func.sum(Review.rating),
+            *(func.count().filter(Review.rating == rating) for rating in RATINGS),
+        )
+        .where(Review.bookUid.is_not(None))
+        .group_by(Review.bookUid)
+    )
+    statement = insert(BookRatingStats).from_select(
+        ["bookUid", *COUNTER_COLUMNS], aggregates
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[BookRatingStats.bookUid],
+        set_={column: statement.excluded[column] for column in COUNTER_COLUMNS},
+    )
+
+    await session.exec(statement)
+    await session.exec(
+        update(BookRatingStats)
+        .where(
+            BookRatingStats.bookUid.not_in(
+                select(Review.bookUid).where(Review.bookUid.is_not(None))
+            )
+        )
+        .values({column: 0 for column in COUNTER_COLUMNS})
+    )
+    await session.commit()
+
+
+async def main() -> None:
+    from src.db.main import asyncEngine
+
+    async with AsyncSession(asyncEngine) as session:
+        await rebuildRatingStats(session)
+
+    await asyncEngine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
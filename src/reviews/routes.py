@@ -3,8 +3,8 @@ from typing import List
 from fastapi import APIRouter, Depends
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from src.db.models import User
-from src.db.main import getSession
+from src.auth.schemas import AuthUserModel
+from src.db.main import getReadSession, getSession
 from src.auth.dependencies import getCurrentUser
 from .schemas import ReviewCreateModel, ReviewShortModel
 from .service import ReviewService
@@ -18,7 +18,7 @@ reviewService = ReviewService()
 async def addReviewToBook(
     bookUid: str,
     reviewData: ReviewCreateModel,
-    currentUser: User = Depends(getCurrentUser),
+    currentUser: AuthUserModel = Depends(getCurrentUser),
     session: AsyncSession = Depends(getSession),
 ):
     newReview = await reviewService.addReviewToBook(
@@ -34,7 +34,7 @@ async def addReviewToBook(
 @reviewRouter.delete("/book/{reviewUid}")
 async def deleteReviewByUid(
     reviewUid: str,
-    currentUser: User = Depends(getCurrentUser),
+    currentUser: AuthUserModel = Depends(getCurrentUser),
     session: AsyncSession = Depends(getSession),
 ):
     await reviewService.deleteReviewByUid(currentUser.email, reviewUid, session)
@@ -44,7 +44,7 @@ async def deleteReviewByUid(
 
 @reviewRouter.get("/my", response_model=List[ReviewShortModel])
 async def getAllUserReviews(
-    user: User = Depends(getCurrentUser), session=Depends(getSession)
+    user: AuthUserModel = Depends(getCurrentUser), session=Depends(getReadSession)
 ):
     reviews = await reviewService.getAllUserReviews(user.uid, session)
     return reviews
@@ -16,7 +16,7 @@ class ReviewModel(BaseModel):
 
 
 class ReviewCreateModel(BaseModel):
-    rating: int = Field(lt=6)
+    rating: int = Field(ge=1, lt=6)
     reviewText: str
     
 
@@ -7,6 +7,7 @@ from src.db.models import Review
 from src.auth.service import UserService
 from src.books.service import BookService
 from .schemas import ReviewCreateModel
+from .ratings import ratingIncrement, ratingDecrement
 import logging
 
 
@@ -64,7 +65,9 @@ class ReviewService:
             newReview.user = user
             newReview.book = book
             session.add(newReview)
+            await session.exec(ratingIncrement(book.uid, newReview.rating))
             await session.commit()
+            await bookService.invalidateBooks(book.uid)
 
             return newReview
 
@@ -98,9 +101,17 @@ class ReviewService:
                     detail="Review not found"
                 )
             
+            bookUid = reviewToDelete.bookUid
             await session.delete(reviewToDelete)
+
+            if bookUid is not None:
+                await session.exec(ratingDecrement(bookUid, reviewToDelete.rating))
+
             await session.commit()
 
+            if bookUid is not None:
+                await bookService.invalidateBooks(bookUid)
+
             return {}
 
         except Exception as e:
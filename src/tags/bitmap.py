@@ -0,0 +1,212 @@
+"""Per-worker bitmap index from tags to the books carrying them.
+
+Every book that has ever been linked to a tag gets a dense row id, and each
+tag keeps a compressed roaring bitmap of the row ids of its books, so
+AND/OR/NOT over tags are bitmap operations and a rarely used tag costs a
+few bytes per book rather than a bit for every book in the index.
+"""
+from typing import Dict, Iterable, List, Tuple
+import uuid
+
+from pyroaring import BitMap
+from sqlalchemy import all_, and_, any_, bindparam, exists, not_, or_, true
+import sqlalchemy.dialects.postgresql as pg
+from sqlmodel import select
+
+from src.config import Config
+from src.db.main import sessionFactory
+from src.db.models import Book, BookTag, Tag
+from src.db.pubsub import ChannelMirror
+from src.db.redis import TAG_INDEX_CHANNEL
+
+from .expressions import fold, matchesUntagged
+
+SEED_CHUNK_SIZE = 10000
+
+
+def sqlTagFilter(node):
+    """The expression as correlated EXISTS subqueries over booktag."""
+
+    def tagged(name: str):
+        return exists(
+            select(BookTag.bookId)
+            .join(Tag, Tag.uid == BookTag.tagId)
+            .where(BookTag.bookId == Book.uid, Tag.name == name)
+        )
+
+    return fold(
+        node,
+        tagged,
+        lambda clauses: and_(*clauses),
+        lambda clauses: or_(*clauses),
+        not_,
+    )
+
+
+class TagBitmapIndex(ChannelMirror):
+    """Bitmap index of the `booktag` table, mirrored by every worker over
+    the tag index channel. `filter` falls back to SQL while the mirror is
+    not current.
+
+    Row ids are never reused. Deleted books only lose their bit in
+    `_tagged`, which every tag bitmap is masked with on evaluation.
+    """
+
+    channel = TAG_INDEX_CHANNEL
+    enabled = Config.TAG_INDEX_ENABLED
+    maxLag = Config.TAG_INDEX_FALLBACK_LAG
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._rowIds: Dict[uuid.UUID, int] = {}
+        self._bookUids: List[uuid.UUID] = []
+        self._tags: Dict[uuid.UUID, BitMap] = {}
+        self._names: Dict[str, uuid.UUID] = {}
+        self._tagged = BitMap()
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "current": self.isCurrent(),
+            "books": len(self._tagged),
+            "row_ids": len(self._bookUids),
+            "tags": len(self._tags),
+            "bytes": sum(
+                len(bitmap.serialize()) for bitmap in self._tags.values()
+            ),
+        }
+
+    def rebuild(
+        self,
+        links: Iterable[Tuple[uuid.UUID, uuid.UUID]],
+        tags: Iterable[Tuple[uuid.UUID, str]],
+    ) -> None:
+        rowIds: Dict[uuid.UUID, int] = {}
+        tagRows: Dict[uuid.UUID, List[int]] = {}
+
+        for bookUid, tagUid in links:
+            rowId = rowIds.setdefault(bookUid, len(rowIds))
+            tagRows.setdefault(tagUid, []).append(rowId)
+
+        self._rowIds = rowIds
+        self._bookUids = list(rowIds)
+        self._tags = {}
+        for tagUid, rows in tagRows.items():
+            bitmap = self._tags[tagUid] = BitMap(rows)
+            bitmap.run_optimize()
+
+        self._names = {name: tagUid for tagUid, name in tags}
+        self._tagged = BitMap(range(len(rowIds)))
+        self._tagged.run_optimize()
+
+    def rowId(self, bookUid: uuid.UUID) -> int:
+        rowId = self._rowIds.get(bookUid)
+
+        if rowId is None:
+            rowId = self._rowIds[bookUid] = len(self._bookUids)
+            self._bookUids.append(bookUid)
+
+        return rowId
+
+    def link(self, bookUid: uuid.UUID, tags: Dict[uuid.UUID, str]) -> None:
+        rowId = self.rowId(bookUid)
+
+        for tagUid, name in tags.items():
+            self._tags.setdefault(tagUid, BitMap()).add(rowId)
+            self._names[name] = tagUid
+
+        self._tagged.add(rowId)
+
+    def dropBook(self, bookUid: uuid.UUID) -> None:
+        rowId = self._rowIds.get(bookUid)
+
+        if rowId is not None:
+            self._tagged.discard(rowId)
+
+    def nameTag(self, tagUid: uuid.UUID, name: str) -> None:
+        self._names = {n: uid for n, uid in self._names.items() if uid != tagUid}
+        self._names[name] = tagUid
+
+    def removeTag(self, tagUid: uuid.UUID) -> None:
+        self._tags.pop(tagUid, None)
+        self._names = {n: uid for n, uid in self._names.items() if uid != tagUid}
+
+    def evaluate(self, node) -> BitMap:
+        """Row ids of the tagged books that satisfy the expression."""
+        tagged = self._tagged
+
+        return fold(
+            node,
+            lambda name: self._tags.get(self._names.get(name), BitMap()) & tagged,
+            lambda values: BitMap.intersection(*values),
+            lambda values: BitMap.union(*values),
+            lambda bits: tagged - bits,
+        )
+
+    def bookUids(self, bits: BitMap) -> List[uuid.UUID]:
+        return [self._bookUids[rowId] for rowId in bits]
+
+    def filter(self, node):
+        """A WHERE clause on Book for the expression.
+
+        Expressions that only match tagged books become `uid = ANY(...)`
+        over the index's result. Those that also match books carrying none
+        of their tags (`NOT horror`) become `uid <> ALL(...)` over the
+        tagged books that fail them. Results above TAG_FILTER_MAX_UIDS and
+        cold workers use the EXISTS form instead.
+        """
+        if not self.isCurrent():
+            return sqlTagFilter(node)
+
+        bits = self.evaluate(node)
+        negated = matchesUntagged(node)
+
+        if negated:
+            bits = self._tagged - bits
+
+        if len(bits) > Config.TAG_FILTER_MAX_UIDS:
+            return sqlTagFilter(node)
+
+        uids = bindparam(
+            "tag_filter_uids", self.bookUids(bits), type_=pg.ARRAY(pg.UUID)
+        )
+
+        if negated:
+            return Book.uid != all_(uids) if bits else true()
+
+        return Book.uid == any_(uids)
+
+    def apply(self, event: dict) -> None:
+        op = event.get("op")
+
+        if op == "link":
+            self.link(
+                uuid.UUID(event["book"]),
+                {uuid.UUID(tagUid): name for tagUid, name in event["tags"].items()},
+            )
+        elif op == "drop":
+            self.dropBook(uuid.UUID(event["book"]))
+        elif op == "tag":
+            self.nameTag(uuid.UUID(event["tag"]), event["name"])
+        elif op == "untag":
+            self.removeTag(uuid.UUID(event["tag"]))
+        else:
+            raise ValueError(op)
+
+    async def seed(self) -> None:
+        async with sessionFactory() as session:
+            result = await session.exec(select(Tag.uid, Tag.name))
+            tags = result.all()
+
+            result = await session.stream(
+                select(BookTag.bookId, BookTag.tagId)
+                .join(Book, Book.uid == BookTag.bookId)
+                .where(Book.deleted_at.is_(None))
+                .execution_options(yield_per=SEED_CHUNK_SIZE)
+            )
+            links = [(bookUid, tagUid) async for bookUid, tagUid in result]
+
+        self.rebuild(links, tags)
+
+
+tagIndex = TagBitmapIndex()
@@ -0,0 +1,151 @@
+"""Boolean tag filter expressions, e.g. `sci-fi AND (space OR "hard sf") AND NOT horror`.
+
+NOT binds tighter than AND, which binds tighter than OR. Tag names that
+contain spaces, parentheses or a keyword are written in double quotes.
+Expressions are parsed into tuples: ("tag", name), ("not", node),
+("and", [nodes]) and ("or", [nodes]).
+"""
+from typing import Callable, List, Set, Tuple, TypeVar
+import re
+
+from src.errors import InvalidTagExpression
+
+MAX_TERMS = 32
+
+TOKEN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|([^\s()"]+))')
+KEYWORDS = {"AND", "OR", "NOT"}
+
+T = TypeVar("T")
+
+
+def tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    position = 0
+    text = text.rstrip()
+
+    while position < len(text):
+        match = TOKEN.match(text, position)
+
+        if match is None:
+            raise InvalidTagExpression()
+
+        opening, closing, quoted, word = match.groups()
+        position = match.end()
+
+        if opening:
+            tokens.append(("(", opening))
+        elif closing:
+            tokens.append((")", closing))
+        elif quoted is not None:
+            tokens.append(("tag", re.sub(r"\\(.)", r"\1", quoted)))
+        elif word.upper() in KEYWORDS:
+            tokens.append((word.upper(), word))
+        else:
+            tokens.append(("tag", word))
+
+    return tokens
+
+
+class Parser:
+    def __init__(self, tokens: List[Tuple[str, str]]) -> None:
+        self.tokens = tokens
+        self.position = 0
+        self.terms = 0
+
+    def peek(self) -> str:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position][0]
+
+        return ""
+
+    def take(self, kind: str) -> str:
+        if self.peek() != kind:
+            raise InvalidTagExpression()
+
+        value = self.tokens[self.position][1]
+        self.position += 1
+
+        return value
+
+    def parse(self):
+        node = self.parseOr()
+
+        if self.position != len(self.tokens):
+            raise InvalidTagExpression()
+
+        return node
+
+    def parseOr(self):
+        nodes = [self.parseAnd()]
+
+        while self.peek() == "OR":
+            self.take("OR")
+            nodes.append(self.parseAnd())
+
+        return nodes[0] if len(nodes) == 1 else ("or", nodes)
+
+    def parseAnd(self):
+        nodes = [self.parseNot()]
+
+        while self.peek() == "AND":
+            self.take("AND")
+            nodes.append(self.parseNot())
+
+        return nodes[0] if len(nodes) == 1 else ("and", nodes)
+
+    def parseNot(self):
+        if self.peek() == "NOT":
+            self.take("NOT")
+            return ("not", self.parseNot())
+
+        if self.peek() == "(":
+            self.take("(")
+            node = self.parseOr()
+            self.take(")")
+            return node
+
+        self.terms += 1
+        if self.terms > MAX_TERMS:
+            raise InvalidTagExpression()
+
+        return ("tag", self.take("tag"))
+
+
+def parseTagExpression(text: str):
+    return Parser(tokenize(text)).parse()
+
+
+def fold(
+    node,
+    tag: Callable[[str], T],
+    allOf: Callable[[List[T]], T],
+    anyOf: Callable[[List[T]], T],
+    negate: Callable[[T], T],
+) -> T:
+    """Evaluates an expression tree bottom-up with the given operations."""
+    kind = node[0]
+
+    if kind == "tag":
+        return tag(node[1])
+
+    if kind == "not":
+        return negate(fold(node[1], tag, allOf, anyOf, negate))
+
+    values = [fold(child, tag, allOf, anyOf, negate) for child in node[1]]
+
+    return allOf(values) if kind == "and" else anyOf(values)
+
+
+def tagNames(node) -> Set[str]:
+    return fold(
+        node,
+        lambda name: {name},
+        lambda values: set().union(*values),
+        lambda values: set().union(*values),
+        lambda value: value,
+    )
+
+
+def matchesUntagged(node) -> bool:
+    """Whether a book carrying none of the expression's tags satisfies it."""
+    return fold(node, lambda name: False, all, any, lambda value: not value)
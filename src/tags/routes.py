@@ -1,15 +1,16 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, Request, Response, status
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 
 from src.auth.dependencies import RoleChecker
-from src.books.schemas import BookModel
-from src.db.main import getSession
+from src.books.schemas import BookDetailModel
+from src.db.main import getReadSession, getSession
+from src.etags import etagMatches, notModified
 
-from .schemas import TagAddModel, TagCreateModel, TagModel
-from .service import TagService
+from .schemas import TagAddModel, TagCreateModel, TagFacetModel, TagModel
+from .service import DEFAULT_FACET_LIMIT, MAX_FACET_LIMIT, TagService
 
 tagsRouter = APIRouter()
 tagService = TagService()
@@ -17,12 +18,46 @@ userRoleChecker = Depends(RoleChecker(["user", "admin"]))
 
 
 @tagsRouter.get("/", response_model=List[TagModel], dependencies=[userRoleChecker])
-async def getAllTags(session: AsyncSession = Depends(getSession)):
+async def getAllTags(
+    request: Request,
+    response: Response,
+    session: AsyncSession = Depends(getReadSession),
+):
+    etag = await tagService.getTagsEtag()
+
+    if etag is not None:
+        if etagMatches(request.headers.get("if-none-match"), etag):
+            return notModified(etag)
+
     tags = await tagService.getTags(session)
 
+    # tags read from a lagging replica must not be tagged with, or stamp,
+    # the current version
+    if session.info.get("replica"):
+        return tags
+
+    if etag is None:
+        etag = await tagService.createTagsEtag()
+
+    if etag is not None:
+        response.headers["ETag"] = etag
+
     return tags
 
 
+@tagsRouter.get(
+    "/facets", response_model=List[TagFacetModel], dependencies=[userRoleChecker]
+)
+async def getTagFacets(
+    q: Optional[str] = Query(default=None, min_length=1, max_length=200),
+    limit: int = Query(default=DEFAULT_FACET_LIMIT, ge=1, le=MAX_FACET_LIMIT),
+    session: AsyncSession = Depends(getReadSession),
+):
+    facets = await tagService.getTagFacets(session, query=q, limit=limit)
+
+    return facets
+
+
 @tagsRouter.post(
     "/",
     response_model=TagModel,
@@ -39,11 +74,11 @@ async def addTag(
 
 
 @tagsRouter.post(
-    "/book/{bookUid}", response_model=BookModel, dependencies=[userRoleChecker]
+    "/book/{bookUid}", response_model=BookDetailModel, dependencies=[userRoleChecker]
 )
 async def addTagsToBook(
     bookUid: str, tagData: TagAddModel, session: AsyncSession = Depends(getSession)
-) -> BookModel:
+) -> BookDetailModel:
 
     bookWithTag = await tagService.addTagsToBook(
         bookUid=bookUid, tagData=tagData, session=session
@@ -11,6 +11,12 @@ class TagModel(BaseModel):
     created_at: datetime
 
 
+class TagFacetModel(BaseModel):
+    uid: uuid.UUID
+    name: str
+    book_count: int
+
+
 class TagCreateModel(BaseModel):
     name: str
 
@@ -1,19 +1,86 @@
+from typing import Dict, List, Optional
+import json
+import logging
+import uuid
+
 from fastapi import status
 from fastapi.exceptions import HTTPException
-from sqlmodel import desc, select
+from redis.exceptions import RedisError
+from sqlmodel import desc, func, select
 from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlalchemy import any_, bindparam, delete, update
+from sqlalchemy.exc import IntegrityError
+import sqlalchemy.dialects.postgresql as pg
 
 from src.books.service import BookService
-from src.db.models import Tag
+from src.config import Config
+from src.db.models import Book, BookTag, Tag, SEARCH_CONFIG
+from src.db.redis import (
+    getVersion,
+    createVersion,
+    bumpVersion,
+    getCachedFacets,
+    setCachedFacets,
+    tagFacetsKey,
+    TAGS_VERSION_KEY,
+)
+from src.etags import makeEtag
 
+from .bitmap import tagIndex
 from .schemas import TagAddModel, TagCreateModel
 from src.errors import BookNotFound, TagNotFound, TagAlreadyExists
 
 bookService = BookService()
 
+DEFAULT_FACET_LIMIT = 50
+MAX_FACET_LIMIT = 500
+
+
+def linkTags(bookUid: uuid.UUID, tagUids: List[uuid.UUID]):
+    """Inserts the missing `booktag` rows and counts each new link on its tag."""
+    linked = (
+        pg.insert(BookTag)
+        .values([{"bookId": bookUid, "tagId": tagUid} for tagUid in tagUids])
+        .on_conflict_do_nothing()
+        .returning(BookTag.tagId)
+        .cte("linked")
+    )
+
+    return (
+        update(Tag)
+        .where(Tag.uid.in_(select(linked.c.tagId)))
+        .values(book_count=Tag.book_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+
 
 class TagService:
 
+    async def getTagsEtag(self) -> Optional[str]:
+        try:
+            version = await getVersion(TAGS_VERSION_KEY)
+        except RedisError as e:
+            logging.exception(e)
+            return None
+
+        return makeEtag(version) if version is not None else None
+
+    async def createTagsEtag(self) -> Optional[str]:
+        """Stamps the tags version after a successful read, if it has none."""
+        try:
+            version = await createVersion(TAGS_VERSION_KEY)
+        except RedisError as e:
+            logging.exception(e)
+            return None
+
+        return makeEtag(version) if version is not None else None
+
+    async def invalidateTags(self) -> None:
+        try:
+            await bumpVersion(TAGS_VERSION_KEY)
+        except RedisError as e:
+            logging.exception(e)
+
     async def getTags(self, session: AsyncSession):
         statement = select(Tag).order_by(desc(Tag.created_at))
 
@@ -21,27 +88,157 @@ class TagService:
 
         return result.all()
 
+    async def getTagFacets(
+        self,
+        session: AsyncSession,
+        query: Optional[str] = None,
+        limit: int = DEFAULT_FACET_LIMIT,
+    ) -> List[dict]:
+        """Tags with the number of live books carrying them, most used first.
+
+        Unscoped counts are read straight from the maintained `book_count`
+        column. With `query` they are aggregated over the books matching
+        that full-text search. Results are cached in Redis under the tags
+        version, so tag writes and book deletions move readers to a fresh
+        entry; scoped counts can lag edits to book text by up to
+        TAG_FACETS_CACHE_TTL. Counts read from the replica are served but
+        not cached.
+        """
+        scope = f"{limit}\n{query or ''}"
+        version = None
+        cacheable = not session.info.get("replica")
+
+        try:
+            version = await getVersion(TAGS_VERSION_KEY)
+
+            if version is not None:
+                cached = await getCachedFacets(tagFacetsKey(version, scope))
+
+                if cached is not None:
+                    return json.loads(cached)
+        except RedisError as e:
+            logging.exception(e)
+            cacheable = False
+
+        if query:
+            tsQuery = func.websearch_to_tsquery(SEARCH_CONFIG, query)
+            bookCount = func.count().label("book_count")
+            statement = (
+                select(Tag.uid, Tag.name, bookCount)
+                .join(BookTag, BookTag.tagId == Tag.uid)
+                .join(Book, Book.uid == BookTag.bookId)
+                .where(
+                    Book.deleted_at.is_(None),
+                    Book.search_vector.bool_op("@@")(tsQuery),
+                )
+                .group_by(Tag.uid)
+                .order_by(desc(bookCount), Tag.name)
+            )
+        else:
+            statement = (
+                select(Tag.uid, Tag.name, Tag.book_count)
+                .where(Tag.book_count > 0)
+                .order_by(desc(Tag.book_count), Tag.name)
+            )
+
+        result = await session.exec(statement.limit(limit))
+        facets = [
+            {"uid": str(uid), "name": name, "book_count": bookCount}
+            for uid, name, bookCount in result.all()
+        ]
+
+        if cacheable:
+            try:
+                if version is None:
+                    version = await createVersion(TAGS_VERSION_KEY)
+
+                if version is not None:
+                    await setCachedFacets(
+                        tagFacetsKey(version, scope),
+                        json.dumps(facets),
+                        Config.TAG_FACETS_CACHE_TTL,
+                    )
+            except RedisError as e:
+                logging.exception(e)
+
+        return facets
+
     async def addTagsToBook(
         self, bookUid: str, tagData: TagAddModel, session: AsyncSession
     ):
-        book = await bookService.getBook(bookUid=bookUid, session=session)
+        """Attaches tags by name, creating the missing ones.
+
+        The statement count does not depend on how many tags are sent: one
+        to find the book, one `INSERT ... ON CONFLICT DO NOTHING RETURNING`
+        for the names, one to look up the names that already existed and
+        one bulk insert of the `booktag` links, which also bumps
+        `book_count` of the tags it actually linked.
+
+        The book row is read FOR SHARE so a concurrent deleteBook, which
+        takes the tag counts back off, waits for the links to be committed.
+        """
+        try:
+            bookUid = uuid.UUID(bookUid)
+        except ValueError:
+            raise BookNotFound()
+
+        result = await session.exec(
+            select(Book.uid)
+            .where(Book.uid == bookUid, Book.deleted_at.is_(None))
+            .with_for_update(read=True)
+        )
 
-        if not book:
+        if result.first() is None:
             raise BookNotFound()
 
-        for tagItem in tagData.tags:
-            result = await session.exec(select(Tag).where(Tag.name == tagItem.name))
+        names = list(dict.fromkeys(tagItem.name for tagItem in tagData.tags))
 
-            tag = result.one_or_none()
-            if not tag:
-                tag = Tag(name=tagItem.name)
+        tagUids = {}
 
-            book.tags.append(tag)
+        if names:
+            tagUids = await self.upsertTags(names, session)
+
+            await session.exec(linkTags(bookUid, list(tagUids.values())))
 
-        session.add(book)
         await session.commit()
-        await session.refresh(book)
-        return book
+        await bookService.invalidateBooks(bookUid)
+        await self.invalidateTags()
+
+        if tagUids:
+            await tagIndex.publish(
+                {
+                    "op": "link",
+                    "book": str(bookUid),
+                    "tags": {str(uid): name for name, uid in tagUids.items()},
+                }
+            )
+
+        return await bookService.getBookDetail(str(bookUid), session)
+
+    async def upsertTags(
+        self, names: List[str], session: AsyncSession
+    ) -> Dict[str, uuid.UUID]:
+        """Maps each of `names` to its tag uid, inserting the tags that
+        do not exist yet. Names created concurrently by another request are
+        skipped by the insert and picked up by the follow-up select."""
+        result = await session.exec(
+            pg.insert(Tag)
+            .values([{"name": name} for name in names])
+            .on_conflict_do_nothing(index_elements=[Tag.name])
+            .returning(Tag.uid, Tag.name)
+        )
+        tagUids = {name: uid for uid, name in result.all()}
+
+        existing = [name for name in names if name not in tagUids]
+
+        if existing:
+            names = bindparam("names", existing, type_=pg.ARRAY(pg.VARCHAR))
+            result = await session.exec(
+                select(Tag.uid, Tag.name).where(Tag.name == any_(names))
+            )
+            tagUids.update({name: uid for uid, name in result.all()})
+
+        return tagUids
 
     async def getTagByUid(self, tagUid: str, session: AsyncSession):
         statement = select(Tag).where(Tag.uid == tagUid)
@@ -50,17 +247,19 @@ class TagService:
         return result.first()
 
     async def addTag(self, tagData: TagCreateModel, session: AsyncSession):
-        statement = select(Tag).where(Tag.name == tagData.name)
-        result = await session.exec(statement)
-        tag = result.first()
+        result = await session.exec(
+            pg.insert(Tag)
+            .values(name=tagData.name)
+            .on_conflict_do_nothing(index_elements=[Tag.name])
+            .returning(Tag)
+        )
+        newTag = result.scalar_one_or_none()
 
-        if tag:
+        if newTag is None:
             raise TagAlreadyExists()
 
-        newTag = Tag(name=tagData.name)
-
-        session.add(newTag)
         await session.commit()
+        await self.invalidateTags()
 
         return newTag
 
@@ -72,21 +271,53 @@ class TagService:
         if not tag:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
+        result = await session.exec(
+            select(BookTag.bookId).where(BookTag.tagId == tag.uid)
+        )
+        bookUids = result.all()
         updateDataDict = tagUpdateData.model_dump()
 
         for k, v in updateDataDict.items():
             setattr(tag, k, v)
 
+        try:
             await session.commit()
-            await session.refresh(tag)
+        except IntegrityError:
+            await session.rollback()
+            raise TagAlreadyExists()
+
+        await session.refresh(tag)
+
+        await bookService.invalidateBooks(*bookUids)
+        await self.invalidateTags()
+        await tagIndex.publish({"op": "tag", "tag": str(tag.uid), "name": tag.name})
 
         return tag
 
     async def deleteTag(self, tagUid: str, session: AsyncSession):
-        tag = self.getTagByUid(tagUid, session)
+        """Unlinks and deletes the tag with two DELETE ... RETURNING
+        statements, which also yield the books whose cached details
+        mention it, rather than loading those books through `Tag.books`."""
+        result = await session.exec(
+            delete(BookTag)
+            .where(BookTag.tagId == tagUid)
+            .returning(BookTag.bookId)
+            .execution_options(synchronize_session=False)
+        )
+        bookUids = result.scalars().all()
 
-        if not tag:
+        result = await session.exec(
+            delete(Tag)
+            .where(Tag.uid == tagUid)
+            .returning(Tag.uid)
+            .execution_options(synchronize_session=False)
+        )
+
+        if result.first() is None:
+            await session.rollback()
             raise TagNotFound()
 
-        await session.delete(tag)
         await session.commit()
+        await bookService.invalidateBooks(*bookUids)
+        await self.invalidateTags()
+        await tagIndex.publish({"op": "untag", "tag": str(tagUid)})
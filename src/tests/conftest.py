@@ -1,4 +1,4 @@
-from src.db.main import getSession
+from src.db.main import getReadSession, getSession
 from src.auth.dependencies import RoleChecker, AccessTokenBearer, RefreshTokenBearer
 from src import app
 from unittest.mock import Mock
@@ -20,6 +20,7 @@ refreshTokenBearer = RefreshTokenBearer()
 roleChecker = RoleChecker(["admin"])
 
 app.dependency_overrides[getSession] = getMockSession
+app.dependency_overrides[getReadSession] = getMockSession
 app.dependency_overrides[roleChecker] = Mock()
 app.dependency_overrides[refreshTokenBearer] = Mock()
 
@@ -1,4 +1,25 @@
-from src.auth.schemas import UserCreateModel
+from unittest.mock import AsyncMock, Mock
+import asyncio
+import threading
+import time
+import uuid
+
+from fastapi.testclient import TestClient
+import pytest
+
+from src import app, ratelimit
+from src.auth.schemas import AuthUserModel, UserCreateModel
+from src.auth import revocation
+from src.auth import routes as authRoutes
+from src.auth import service as authService
+from src.auth.revocation import RevocationList
+from src.auth.service import UserService, authUserCache
+from src.auth import utils as authUtils
+from src.auth.utils import BoundedExecutor, createAccessToken, decodeToken, evictToken
+from src.cache import TTLCache
+from src.db import redis as redisModule
+from src.errors import ServiceBusy
+from src.ratelimit import parseRate
 
 authPrefix = f"/api/0.1/auth"
 
@@ -24,3 +45,198 @@ def testUserCreation(fakeSession, fakeUserService, testClient):
     assert fakeUserService.userExistsCalledOnceWith(signupData["email"], fakeSession)
     assert fakeUserService.createUserCalledOnce()
     assert fakeUserService.createUserCalledOnceWith(userData, fakeSession)
+
+
+def testTTLCacheExpiresAndEvicts():
+    cache = TTLCache(maxSize=2)
+    now = time.time()
+
+    cache.set("a", 1, now + 60)
+    cache.set("b", 2, now - 1)
+
+    assert cache.get("a") == 1
+    assert cache.get("b") is None
+
+    cache.set("c", 3, now + 60)
+    cache.set("d", 4, now + 60)
+
+    assert cache.get("a") is None
+    assert len(cache) == 2
+
+
+def testAuthUserServedFromLocalCache():
+    authUser = AuthUserModel(
+        uid=uuid.uuid4(), email="cached@example.com", role="user", isVerified=True
+    )
+    authUserCache.set(authUser.email, authUser, time.time() + 60)
+    session = Mock()
+
+    try:
+        result = asyncio.run(UserService().getAuthUser(authUser.email, session))
+    finally:
+        authUserCache.pop(authUser.email)
+
+    assert result == authUser
+    session.exec.assert_not_called()
+
+
+@pytest.mark.parametrize(
+    "stamp, created, writtenUnder",
+    [("v1", None, "v1"), (None, "v2", "v2"), (None, None, None)],
+)
+def testAuthUserOnlyCachedUnderAVersionReadBeforeTheRow(
+    monkeypatch, stamp, created, writtenUnder
+):
+    email = "raced@example.com"
+    setCachedAuthUser = AsyncMock()
+    monkeypatch.setattr(
+        authService, "getCachedAuthUser", AsyncMock(return_value=(stamp, None))
+    )
+    monkeypatch.setattr(
+        authService, "createAuthUserVersion", AsyncMock(return_value=created)
+    )
+    monkeypatch.setattr(authService, "setCachedAuthUser", setCachedAuthUser)
+
+    row = Mock(uid=uuid.uuid4(), email=email, role="user", isVerified=True)
+    session = Mock()
+    session.exec = AsyncMock(return_value=Mock(first=Mock(return_value=row)))
+
+    try:
+        asyncio.run(UserService().getAuthUser(email, session))
+    finally:
+        authUserCache.pop(email)
+
+    # None: an update stamped the user between the miss and the write-back
+    if writtenUnder is None:
+        setCachedAuthUser.assert_not_awaited()
+    else:
+        assert setCachedAuthUser.await_args.args[1] == writtenUnder
+
+
+def testAuthUserWrittenUnderAnOldVersionIsIgnored(monkeypatch):
+    monkeypatch.setattr(
+        redisModule.redisClient,
+        "mget",
+        AsyncMock(return_value=[b"v2", b'v1\n{"role": "user"}']),
+    )
+
+    assert asyncio.run(redisModule.getCachedAuthUser("a@example.com")) == ("v2", None)
+
+def testRevocationCheckedLocallyWhileSubscriberCurrent(monkeypatch):
+    redisCheck = AsyncMock(return_value=True)
+    monkeypatch.setattr(revocation, "tokenInBlocklist", redisCheck)
+
+    revocationList = RevocationList()
+    revocationList.add("revoked", time.time() + 60)
+    revocationList.add("expired", time.time() - 1)
+    revocationList.ready = True
+    revocationList.lastPolledAt = time.monotonic()
+
+    assert asyncio.run(revocationList.isRevoked("revoked"))
+    assert not asyncio.run(revocationList.isRevoked("expired"))
+    assert not asyncio.run(revocationList.isRevoked("unknown"))
+    redisCheck.assert_not_called()
+
+    revocationList.lastPolledAt = 0.0
+
+    assert asyncio.run(revocationList.isRevoked("unknown"))
+    redisCheck.assert_awaited_once_with("unknown")
+
+
+def testBoundedExecutorRejectsWhenQueueFull():
+    executor = BoundedExecutor(kind="thread", workers=1, queueSize=1)
+    release = threading.Event()
+
+    async def saturate():
+        pending = [
+            asyncio.ensure_future(executor.run(release.wait)) for _ in range(2)
+        ]
+        await asyncio.sleep(0)
+
+        with pytest.raises(ServiceBusy):
+            await executor.run(release.wait)
+
+        release.set()
+        return await asyncio.gather(*pending)
+
+    try:
+        assert asyncio.run(saturate()) == [True, True]
+    finally:
+        executor.shutdown()
+
+
+def testCancelledCallsStayInFlightUntilThePoolFinishes():
+    executor = BoundedExecutor(kind="thread", workers=1, queueSize=0)
+    release = threading.Event()
+
+    async def disconnect():
+        call = asyncio.ensure_future(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        call.cancel()
+        await asyncio.sleep(0)
+
+        with pytest.raises(ServiceBusy):
+            await asyncio.wait_for(executor.run(release.wait), timeout=1)
+
+        release.set()
+        while executor.inFlight:
+            await asyncio.sleep(0.01)
+
+        return await executor.run(release.wait)
+
+    try:
+        assert asyncio.run(disconnect())
+    finally:
+        release.set()
+        executor.shutdown()
+
+
+def testParseRate():
+    assert parseRate("5/minute") == (5, 60)
+    assert parseRate("100/ hour") == (100, 3600)
+
+
+def testLoginRateLimitedBeforeUserLookup(monkeypatch):
+    takeToken = AsyncMock(side_effect=[0.0, 2.2])
+    getUserByEmail = AsyncMock()
+    monkeypatch.setattr(ratelimit, "takeToken", takeToken)
+    monkeypatch.setattr(authRoutes.userService, "getUserByEmail", getUserByEmail)
+
+    client = TestClient(app, base_url="http://localhost")
+    response = client.post(
+        url=f"{authPrefix}/login",
+        json={"email": " Someone@Example.com", "password": "qwerty12345"},
+    )
+
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "3"
+    assert takeToken.await_args_list[1].args[0] == "ratelimit:login:email:someone@example.com"
+    getUserByEmail.assert_not_called()
+
+
+def testDecodedTokenCachedUntilRevoked(monkeypatch):
+    jwtDecode = Mock(wraps=authUtils.jwt.decode)
+    monkeypatch.setattr(authUtils.jwt, "decode", jwtDecode)
+
+    token = createAccessToken(userData={"email": "cached@example.com"})
+
+    first = decodeToken(token)
+    second = decodeToken(token)
+
+    assert first == second
+    assert jwtDecode.call_count == 1
+
+    evictToken(first["jti"])
+    decodeToken(token)
+
+    assert jwtDecode.call_count == 2
+
+
+def testBlocklistMessagesReachRevocationList():
+    revocationList = RevocationList()
+
+    revocationList._handle(f"revoked {time.time() + 60}".encode())
+    revocationList._handle(b"malformed")
+
+    assert revocationList.contains("revoked")
+    assert len(revocationList) == 1
@@ -1,4 +1,28 @@
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock, Mock
+import asyncio
+import json
+import uuid
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src import app
+from src.auth.dependencies import getCurrentUser
+from src.books import service as bookServiceModule
+from src.books.routes import accessTokenBearer, BookService as bookService
+from src.db.main import getReadSession, getSession
+from src.books.purge import purgeBook
+from src.books.suggest import PrefixIndex, SuggestionMirror, TITLE, AUTHOR
+from src.books.utils import encodeCursor, decodeCursor, iterLines
+from src.db.models import Book, BookRatingStats
+from src.errors import InvalidCursor, LineTooLong
+from src.reviews.ratings import RATINGS, ratingDecrement, ratingIncrement
+from src.etags import etagMatches
+
 booksPrefix = f"/api/0.1/books"
+RATING_COLUMNS = ("rating_count", "rating_avg")
 
 
 def testGetAllBooks(testClient, fakeBookService, fakeSession):
@@ -7,4 +31,392 @@ def testGetAllBooks(testClient, fakeBookService, fakeSession):
     )
 
     assert fakeBookService.getAllBooksCalledOnce()
-    assert fakeBookService.getAllBooksCalledOnceWith(fakeSession)
\ No newline at end of file
+    assert fakeBookService.getAllBooksCalledOnceWith(fakeSession)
+
+
+def testCursorRoundTrip():
+    createdAt = datetime(2025, 1, 18, 0, 29, 52, 17735)
+    uid = uuid.uuid4()
+
+    assert decodeCursor(encodeCursor(createdAt, uid)) == (createdAt, uid)
+
+
+def testMalformedCursorRejected():
+    with pytest.raises(InvalidCursor):
+        decodeCursor("not-a-cursor")
+
+
+def testPrefixIndexSearch():
+    hobbit, silmarillion = uuid.uuid4(), uuid.uuid4()
+    index = PrefixIndex()
+    index.rebuild([(hobbit, "The Hobbit", "J. R. R. Tolkien")])
+    index.addBook(silmarillion, "The Silmarillion", "J. R. R. Tolkien")
+
+    assert index.search("the h", 10) == [(TITLE, "The Hobbit")]
+    assert index.search("j. r.", 10) == [(AUTHOR, "J. R. R. Tolkien")]
+
+    index.removeBook(silmarillion)
+
+    assert index.search("the s", 10) == []
+    assert index.search("j. r.", 10) == [(AUTHOR, "J. R. R. Tolkien")]
+
+
+def testSuggestionEventsReachOtherWorkers():
+    bookUid = uuid.uuid4()
+    writer, reader = PrefixIndex(), PrefixIndex()
+    writerMirror, readerMirror = SuggestionMirror(writer), SuggestionMirror(reader)
+
+    # the writer applies its own events and the reader gets them from the
+    # channel; a repeated event changes nothing
+    events = [
+        {"op": "add", "books": [[str(bookUid), "Dune", "Frank Herbert"]]},
+        {"op": "add", "books": [[str(bookUid), "Dune Messiah", "Frank Herbert"]]},
+        {"op": "add", "books": [[str(bookUid), "Dune Messiah", "Frank Herbert"]]},
+    ]
+    for event in events:
+        writerMirror.apply(event)
+        readerMirror._handle(json.dumps(event).encode())
+
+    assert reader.search("dune", 10) == writer.search("dune", 10) == [
+        (TITLE, "Dune Messiah")
+    ]
+
+    readerMirror._handle(json.dumps({"op": "remove", "books": [str(bookUid)]}).encode())
+
+    assert reader.search("dune", 10) == []
+    assert reader.search("frank", 10) == []
+
+
+def testIterLinesAcrossChunks():
+    async def chunks():
+        for chunk in (b"title,au", b"thor\r\nA,", b"B\n\nC,D"):
+            yield chunk
+
+    async def collect():
+        return [item async for item in iterLines(chunks(), 64)]
+
+    assert asyncio.run(collect()) == [
+        (1, b"title,author"),
+        (2, b"A,B"),
+        (3, b""),
+        (4, b"C,D"),
+    ]
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+        self.info = {}
+
+    async def exec(self, statement):
+        self.statements.append(statement)
+        return Mock(all=Mock(return_value=[]))
+
+
+@pytest.fixture
+def recordingSession():
+    session = RecordingSession()
+
+    def getRecordingSession():
+        yield session
+
+    overrides = dict(app.dependency_overrides)
+    app.dependency_overrides[getSession] = getRecordingSession
+    app.dependency_overrides[getReadSession] = getRecordingSession
+    app.dependency_overrides[getCurrentUser] = lambda: SimpleNamespace(
+        isVerified=True, role="user", email="reader@example.com"
+    )
+    app.dependency_overrides[accessTokenBearer] = lambda: {
+        "user": {"userUid": str(uuid.uuid4())}
+    }
+
+    yield session
+
+    app.dependency_overrides.clear()
+    app.dependency_overrides.update(overrides)
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        f"{booksPrefix}/",
+        f"{booksPrefix}/user/{uuid.uuid4()}",
+        f"{booksPrefix}/search?q=dune",
+    ],
+)
+def testListEndpointsIssueOneStatement(recordingSession, path):
+    client = TestClient(app, base_url="http://localhost")
+
+    response = client.get(path)
+
+    assert response.status_code == 200
+    assert len(recordingSession.statements) == 1
+
+    statement = recordingSession.statements[0]
+    assert all(
+        column["entity"] is Book and column["expr"] is not Book
+        for column in statement.column_descriptions
+        if column["name"] not in ("rank", *RATING_COLUMNS)
+    )
+    assert [
+        column["name"]
+        for column in statement.column_descriptions
+        if column["entity"] is BookRatingStats
+    ] == list(RATING_COLUMNS)
+
+
+def testIterLinesRejectsOverlongLines():
+    async def chunks():
+        yield b"title,author\n"
+        for _ in range(10):
+            yield b"x" * 8
+
+    async def collect():
+        return [item async for item in iterLines(chunks(), 32)]
+
+    with pytest.raises(LineTooLong) as error:
+        asyncio.run(collect())
+
+    assert error.value.line == 2
+
+
+def testOverlongLineReportsCommittedRows(recordingSession, monkeypatch):
+    copyBooks = AsyncMock()
+    monkeypatch.setattr(bookServiceModule.Config, "BULK_INSERT_BATCH_SIZE", 2)
+    monkeypatch.setattr(bookServiceModule.Config, "BULK_MAX_LINE_LENGTH", 200)
+    monkeypatch.setattr(bookService, "copyBooks", copyBooks)
+    row = {
+        "title": "Dune",
+        "author": "Frank Herbert",
+        "publisher": "Chilton",
+        "published_date": "1965-08-01",
+        "page_count": 412,
+        "language": "en",
+    }
+    body = "\n".join([json.dumps(row)] * 3 + ["x" * 300]).encode()
+    client = TestClient(app, base_url="http://localhost")
+
+    response = client.post(
+        f"{booksPrefix}/bulk",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"},
+    )
+
+    assert response.status_code == 400
+    assert response.json()["error_code"] == "line_too_long"
+    assert response.json()["line"] == 4
+    assert response.json()["inserted"] == 2
+    copyBooks.assert_awaited_once()
+
+
+
+def testTagFilterExpression(recordingSession):
+    client = TestClient(app, base_url="http://localhost")
+
+    response = client.get(f"{booksPrefix}/", params={"tags": "sf AND NOT horror"})
+    assert response.status_code == 200
+    assert len(recordingSession.statements) == 1
+
+    response = client.get(f"{booksPrefix}/", params={"tags": "sf AND (horror"})
+    assert response.status_code == 400
+    assert response.json()["error_code"] == "invalid_tag_expression"
+
+
+@pytest.mark.parametrize("rating, bucket", [(4, "rating_4"), (0, None), (-2, None)])
+def testRatingCountersSkipBucketsOutsideRange(rating, bucket):
+    bookUid = uuid.uuid4()
+    buckets = [f"rating_{value}" for value in RATINGS]
+
+    params = ratingIncrement(bookUid, rating).compile().params
+    assert params["rating_sum"] == rating
+    assert [column for column in buckets if params[column]] == ([bucket] if bucket else [])
+
+    sql = str(ratingDecrement(bookUid, rating))
+    assert [column for column in buckets if f"{column}=" in sql] == (
+        [bucket] if bucket else []
+    )
+
+
+def testEtagMatchesIfNoneMatch():
+    assert etagMatches('"abc"', '"abc"')
+    assert etagMatches('"x", W/"abc"', '"abc"')
+    assert etagMatches("*", '"abc"')
+    assert not etagMatches('"abd"', '"abc"')
+    assert not etagMatches(None, '"abc"')
+
+
+def testUnchangedBookAnsweredWithoutQuery(recordingSession, monkeypatch):
+    async def getBookEtag(bookUid):
+        return '"v1"'
+
+    monkeypatch.setattr(bookService, "getBookEtag", getBookEtag)
+    client = TestClient(app, base_url="http://localhost")
+
+    response = client.get(
+        f"{booksPrefix}/{uuid.uuid4()}", headers={"If-None-Match": '"v1"'}
+    )
+
+    assert response.status_code == 304
+    assert response.headers["ETag"] == '"v1"'
+    assert recordingSession.statements == []
+
+
+
+class DetailSession(RecordingSession):
+    def __init__(self, replica, found=True):
+        super().__init__()
+        self.info["replica"] = replica
+        self.found = found
+        self.book = Book(
+            uid=uuid.uuid4(),
+            title="Dune",
+            author="Frank Herbert",
+            publisher="Chilton",
+            published_date=datetime(1965, 8, 1).date(),
+            page_count=412,
+            language="en",
+            version=1,
+            created_at=datetime(2024, 1, 1),
+            updated_at=datetime(2024, 1, 1),
+        )
+
+    async def exec(self, statement):
+        self.statements.append(statement)
+        rows = [(self.book, None)] if self.found else []
+        return Mock(all=Mock(return_value=rows))
+
+
+@pytest.mark.parametrize("replica", [True, False])
+def testReplicaDetailReadsCarryNoEtag(recordingSession, monkeypatch, replica):
+    recordingSession.info["replica"] = replica
+    monkeypatch.setattr(bookService, "getBookEtag", AsyncMock(return_value='"v1"'))
+    book = DetailSession(replica).book.model_dump()
+    monkeypatch.setattr(
+        bookService,
+        "getBookDetail",
+        AsyncMock(return_value={**book, "reviews": [], "tags": []}),
+    )
+    client = TestClient(app, base_url="http://localhost")
+
+    response = client.get(f"{booksPrefix}/{book['uid']}")
+
+    assert response.status_code == 200
+    assert ("ETag" in response.headers) == (not replica)
+
+@pytest.mark.parametrize("replica, writesBack", [(True, False), (False, True)])
+def testReplicaReadsAreNotWrittenToCache(monkeypatch, replica, writesBack):
+    session = DetailSession(replica)
+    bookUid = str(session.book.uid)
+    setCachedBooks = AsyncMock()
+    loaders = SimpleNamespace(
+        reviewsByBook=SimpleNamespace(loadMany=AsyncMock(return_value=[[]])),
+        tagsByBook=SimpleNamespace(loadMany=AsyncMock(return_value=[[]])),
+    )
+    monkeypatch.setattr(
+        bookServiceModule, "getCachedBooks", AsyncMock(return_value=[("v2", None)])
+    )
+    monkeypatch.setattr(bookServiceModule, "setCachedBooks", setCachedBooks)
+    monkeypatch.setattr(bookServiceModule, "getLoaders", lambda session: loaders)
+
+    details = asyncio.run(bookService.getBookDetails([bookUid], session))
+
+    assert details[bookUid].title == "Dune"
+    assert setCachedBooks.await_count == int(writesBack)
+
+
+@pytest.mark.parametrize("found", [True, False])
+def testVersionStampsOnlyCreatedForExistingBooks(monkeypatch, found):
+    session = DetailSession(replica=False, found=found)
+    bookUid = str(session.book.uid)
+    createBookVersions = AsyncMock(return_value=["v1"])
+    setCachedBooks = AsyncMock()
+    loaders = SimpleNamespace(
+        reviewsByBook=SimpleNamespace(loadMany=AsyncMock(return_value=[[]] * found)),
+        tagsByBook=SimpleNamespace(loadMany=AsyncMock(return_value=[[]] * found)),
+    )
+    monkeypatch.setattr(
+        bookServiceModule, "getCachedBooks", AsyncMock(return_value=[(None, None)])
+    )
+    monkeypatch.setattr(bookServiceModule, "createBookVersions", createBookVersions)
+    monkeypatch.setattr(bookServiceModule, "setCachedBooks", setCachedBooks)
+    monkeypatch.setattr(bookServiceModule, "getLoaders", lambda session: loaders)
+
+    details = asyncio.run(bookService.getBookDetails([bookUid], session))
+
+    assert (bookUid in details) == found
+    assert createBookVersions.await_count == int(found)
+    assert setCachedBooks.await_count == int(found)
+    if found:
+        assert setCachedBooks.await_args.args[0][0][1] == "v1"
+
+
+class StaleVersionSession(RecordingSession):
+    async def exec(self, statement):
+        self.statements.append(statement)
+        found = uuid.uuid4() if len(self.statements) > 1 else None
+        return Mock(first=Mock(return_value=found))
+
+    async def rollback(self):
+        pass
+
+
+def testStalePatchReturnsConflict(recordingSession):
+    session = StaleVersionSession()
+    app.dependency_overrides[getSession] = lambda: session
+    client = TestClient(app, base_url="http://localhost")
+
+    response = client.patch(
+        f"{booksPrefix}/{uuid.uuid4()}",
+        json={
+            "title": "Dune",
+            "author": "Frank Herbert",
+            "publisher": "Chilton",
+            "page_count": 412,
+            "language": "en",
+            "version": 3,
+        },
+    )
+
+    assert response.status_code == 409
+    assert response.json()["error_code"] == "version_conflict"
+    assert session.statements[0].is_update
+    assert "version" in str(session.statements[0].whereclause)
+
+
+class FakePurgeEngine:
+    def __init__(self, rowcounts):
+        self.rowcounts = list(rowcounts)
+        self.transactions = 0
+
+    def begin(self):
+        engine = self
+
+        class Transaction:
+            async def __aenter__(self):
+                engine.transactions += 1
+                return self
+
+            async def __aexit__(self, *args):
+                return None
+
+            async def execute(self, statement):
+                return SimpleNamespace(rowcount=engine.rowcounts.pop(0))
+
+        return Transaction()
+
+
+def testPurgeBookDeletesInBoundedBatches():
+    # two full review batches and a short one, one short tag batch, then the
+    # final transaction's stragglers and the book row itself
+    engine = FakePurgeEngine([2, 2, 1, 1, 0, 0, 1])
+    reports = []
+
+    progress = asyncio.run(
+        purgeBook(engine, str(uuid.uuid4()), batchSize=2, onProgress=reports.append)
+    )
+
+    assert progress["reviews_deleted"] == 5
+    assert progress["tags_unlinked"] == 1
+    assert progress["book_deleted"]
+    assert [report["reviews_deleted"] for report in reports] == [2, 4, 5, 5]
+    assert engine.transactions == 5
@@ -0,0 +1,179 @@
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+import asyncio
+
+import pytest
+
+from src import app
+from src.config import Config
+from src.db import instrumentation
+from src.db import main as dbMain
+from src.db.instrumentation import (
+    NPlusOneQuery,
+    QueryStats,
+    SlowQueryLog,
+    currentQueryStats,
+    fingerprint,
+)
+from src.db.loaders import DataLoader
+from src.db.main import InstrumentedPool, engineOptions
+
+
+def testEngineOptionsOnlyPassStatementCacheToAsyncpg():
+    asyncpgOptions = engineOptions("postgresql+asyncpg://u:p@localhost/db")
+    otherOptions = engineOptions("postgresql+psycopg://u:p@localhost/db")
+
+    assert asyncpgOptions["poolclass"] is InstrumentedPool
+    assert "prepared_statement_cache_size" in asyncpgOptions["connect_args"]
+    assert "connect_args" not in otherOptions
+
+
+@pytest.mark.parametrize(
+    "dependency, method, recentWrite, expected",
+    [
+        ("getReadSession", "GET", False, "replica"),
+        ("getReadSession", "GET", True, "primary"),
+        ("getSession", "GET", False, "primary"),
+        ("getSession", "POST", False, "primary"),
+    ],
+)
+def testOnlyReadSessionsUseReplica(
+    monkeypatch, dependency, method, recentWrite, expected
+):
+    monkeypatch.setattr(dbMain, "sessionFactory", lambda: FakeSession("primary"))
+    monkeypatch.setattr(dbMain, "replicaSessionFactory", lambda: FakeSession("replica"))
+    monkeypatch.setattr(dbMain, "hasRecentWrite", AsyncMock(return_value=recentWrite))
+    markRecentWrite = AsyncMock()
+    monkeypatch.setattr(dbMain, "markRecentWrite", markRecentWrite)
+
+    request = SimpleNamespace(
+        method=method,
+        headers={},
+        state=SimpleNamespace(tokenData={"user": {"userUid": "user-1"}}),
+    )
+
+    async def openSession():
+        sessions = getattr(dbMain, dependency)(request)
+        session = await sessions.__anext__()
+        await sessions.aclose()
+        return session
+
+    session = asyncio.run(openSession())
+
+    assert session.name == expected
+    assert markRecentWrite.await_count == (method == "POST")
+
+
+def testVerifyAccountWritesThroughPrimary():
+    route = next(
+        route for route in app.routes if getattr(route, "name", "") == "verifyUserAccount"
+    )
+
+    calls = [dependency.call for dependency in route.dependant.dependencies]
+
+    assert dbMain.getSession in calls
+    assert dbMain.getReadSession not in calls
+
+
+def testFingerprintIgnoresLiteralsAndInLists():
+    first = fingerprint("SELECT * FROM reviews WHERE book_uid = $1 AND rating > 3")
+    second = fingerprint("SELECT *\n  FROM reviews WHERE book_uid = $7 AND rating > 4")
+
+    assert first == second
+    assert fingerprint("uid IN ($1, $2, $3)") == fingerprint("uid IN ($1)")
+
+
+def testRepeatedStatementRaisesWhenConfigured(monkeypatch):
+    monkeypatch.setattr(Config, "N_PLUS_ONE_THRESHOLD", 3)
+    monkeypatch.setattr(Config, "N_PLUS_ONE_ACTION", "raise")
+
+    stats = QueryStats()
+    token = currentQueryStats.set(stats)
+    conn = SimpleNamespace(info={})
+    statement = "SELECT * FROM tags WHERE book_uid = $1"
+
+    try:
+        for _ in range(2):
+            instrumentation.beforeCursorExecute(conn, None, statement, (), None, False)
+            instrumentation.afterCursorExecute(conn, None, statement, (), None, False)
+
+        instrumentation.beforeCursorExecute(conn, None, statement, (), None, False)
+        with pytest.raises(NPlusOneQuery):
+            instrumentation.afterCursorExecute(conn, None, statement, (), None, False)
+    finally:
+        currentQueryStats.reset(token)
+
+    assert stats.count == 3
+    assert stats.repeated(3) == [(fingerprint(statement), 3)]
+
+
+def testSlowQueryLogKeepsNewestEntriesWithoutValues(monkeypatch):
+    monkeypatch.setattr(Config, "SLOW_QUERY_EXPLAIN_RATE", 0.0)
+    slowQueryLog = SlowQueryLog(size=2)
+
+    for duration in (0.3, 0.4, 0.5):
+        slowQueryLog.observe(
+            None, "SELECT * FROM books WHERE title = $1", ("secret",), duration
+        )
+
+    entries = slowQueryLog.snapshot()
+
+    assert [entry["duration_ms"] for entry in entries] == [500.0, 400.0]
+    assert entries[0]["sql"] == "SELECT * FROM books WHERE title = ?"
+    assert entries[0]["parameters"] == ["str"]
+    assert entries[0]["plan"] is None
+
+
+@pytest.mark.parametrize(
+    "inFlight, idleConnections, explained",
+    [(0, 1, True), (1, 1, False), (0, 0, False)],
+)
+def testSlowQueryExplainsAreCapped(monkeypatch, inFlight, idleConnections, explained):
+    monkeypatch.setattr(Config, "SLOW_QUERY_EXPLAIN_RATE", 1.0)
+    monkeypatch.setattr(Config, "SLOW_QUERY_MAX_EXPLAINS", 1)
+    slowQueryLog = SlowQueryLog(size=10)
+    slowQueryLog._tasks.update(object() for _ in range(inFlight))
+    explain = AsyncMock()
+    monkeypatch.setattr(slowQueryLog, "explain", explain)
+    engine = SimpleNamespace(pool=SimpleNamespace(checkedin=lambda: idleConnections))
+
+    async def observe():
+        slowQueryLog.observe(engine, "SELECT * FROM books", (), 0.5)
+        await asyncio.sleep(0)
+
+    asyncio.run(observe())
+
+    assert explain.called == explained
+    assert slowQueryLog.skippedExplains == int(not explained)
+
+
+class FakeSession:
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.info = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return None
+
+
+def testDataLoaderBatchesOneTickAndMemoizes():
+    batches = []
+
+    async def batchLoad(keys):
+        batches.append(keys)
+        return {key: key * 10 for key in keys if key != 3}
+
+    async def run():
+        loader = DataLoader(batchLoad, missing=list)
+        first = await asyncio.gather(loader.load(1), loader.load(2), loader.load(1))
+        second = await loader.loadMany([2, 3])
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert first == [10, 20, 10]
+    assert second == [20, []]
+    assert batches == [[1, 2], [3]]
@@ -0,0 +1,201 @@
+from unittest.mock import AsyncMock, Mock
+import asyncio
+import time
+import uuid
+
+import pytest
+
+from src.errors import InvalidTagExpression
+from src.tags import service as tagService
+from src.tags.bitmap import TagBitmapIndex
+from src.tags.expressions import parseTagExpression
+from src.tags.schemas import TagAddModel
+from src.tags.service import TagService, bookService
+
+
+class UpsertSession:
+    """Finds the book, then reports half of the fifty names as new."""
+
+    def __init__(self):
+        self.statements = []
+        self.commit = AsyncMock()
+
+    async def exec(self, statement):
+        self.statements.append(statement)
+        rows = []
+
+        if len(self.statements) == 1:
+            rows = [uuid.uuid4()]
+        elif getattr(statement, "is_insert", False) and statement.table.name == "tags":
+            rows = [(uuid.uuid4(), f"tag-{i}") for i in range(25)]
+        elif len(self.statements) == 3:
+            rows = [(uuid.uuid4(), f"tag-{i}") for i in range(25, 50)]
+
+        first = rows[0] if rows else None
+
+        return Mock(first=Mock(return_value=first), all=Mock(return_value=rows))
+
+
+def testAddTagsToBookUsesConstantStatements(monkeypatch):
+    monkeypatch.setattr(bookService, "invalidateBooks", AsyncMock())
+    monkeypatch.setattr(bookService, "getBookDetail", AsyncMock(return_value={}))
+    monkeypatch.setattr(TagService, "invalidateTags", AsyncMock())
+
+    tagData = TagAddModel(tags=[{"name": f"tag-{i}"} for i in range(50)] * 2)
+    session = UpsertSession()
+
+    asyncio.run(TagService().addTagsToBook(str(uuid.uuid4()), tagData, session))
+
+    # book lookup, tag upsert, lookup of pre-existing names, and the booktag
+    # insert that also bumps the counters of the tags it linked
+    assert len(session.statements) == 4
+    assert session.statements[-1].table.name == "tags"
+    assert "INSERT INTO booktag" in str(session.statements[-1])
+    session.commit.assert_awaited_once()
+
+
+def testDeleteTagOnlyReadsLinkedBookUids(monkeypatch):
+    bookUids = [uuid.uuid4(), uuid.uuid4()]
+    tagUid = uuid.uuid4()
+    invalidateBooks = AsyncMock()
+    monkeypatch.setattr(bookService, "invalidateBooks", invalidateBooks)
+    monkeypatch.setattr(TagService, "invalidateTags", AsyncMock())
+    monkeypatch.setattr(tagService.tagIndex, "publish", AsyncMock())
+
+    session = Mock(commit=AsyncMock())
+    session.exec = AsyncMock(
+        side_effect=[
+            Mock(scalars=Mock(return_value=Mock(all=Mock(return_value=bookUids)))),
+            Mock(first=Mock(return_value=(tagUid,))),
+        ]
+    )
+
+    asyncio.run(TagService().deleteTag(str(tagUid), session))
+
+    unlink, drop = [call.args[0] for call in session.exec.await_args_list]
+    assert "DELETE FROM booktag" in str(unlink)
+    assert "DELETE FROM tags" in str(drop)
+    assert "books" not in str(unlink) + str(drop)
+    invalidateBooks.assert_awaited_once_with(*bookUids)
+    session.commit.assert_awaited_once()
+
+
+def testTagFacetsServedFromCache(monkeypatch):
+    cache = {}
+
+    async def setCachedFacets(key, payload, ttl):
+        cache[key] = payload
+
+    monkeypatch.setattr(tagService, "getVersion", AsyncMock(return_value="v1"))
+    monkeypatch.setattr(tagService, "getCachedFacets", AsyncMock(side_effect=cache.get))
+    monkeypatch.setattr(tagService, "setCachedFacets", setCachedFacets)
+
+    tagUid = uuid.uuid4()
+    session = Mock(info={})
+    session.exec = AsyncMock(
+        return_value=Mock(all=Mock(return_value=[(tagUid, "sci-fi", 3)]))
+    )
+
+    first = asyncio.run(TagService().getTagFacets(session))
+    second = asyncio.run(TagService().getTagFacets(session))
+
+    assert first == second == [{"uid": str(tagUid), "name": "sci-fi", "book_count": 3}]
+    session.exec.assert_awaited_once()
+    assert "book_count" in str(session.exec.await_args.args[0])
+
+
+def testReplicaFacetsAreNotCached(monkeypatch):
+    setCachedFacets = AsyncMock()
+    createVersion = AsyncMock(return_value="v1")
+    monkeypatch.setattr(tagService, "getVersion", AsyncMock(return_value=None))
+    monkeypatch.setattr(tagService, "createVersion", createVersion)
+    monkeypatch.setattr(tagService, "setCachedFacets", setCachedFacets)
+
+    session = Mock(info={"replica": True})
+    session.exec = AsyncMock(return_value=Mock(all=Mock(return_value=[])))
+
+    assert asyncio.run(TagService().getTagFacets(session)) == []
+    createVersion.assert_not_awaited()
+    setCachedFacets.assert_not_awaited()
+
+
+def testTagExpressionPrecedence():
+    assert parseTagExpression('sf OR space AND NOT "hard sf"') == (
+        "or",
+        [("tag", "sf"), ("and", [("tag", "space"), ("not", ("tag", "hard sf"))])],
+    )
+
+
+@pytest.mark.parametrize("expression", ["sf AND", "(sf", "sf space", "NOT", ")"])
+def testMalformedTagExpressionRejected(expression):
+    with pytest.raises(InvalidTagExpression):
+        parseTagExpression(expression)
+
+
+@pytest.fixture
+def tagIndex():
+    books = [uuid.uuid4() for _ in range(4)]
+    sf, space, horror = uuid.uuid4(), uuid.uuid4(), uuid.uuid4()
+
+    index = TagBitmapIndex()
+    index.rebuild(
+        [(books[0], sf), (books[1], sf), (books[1], space), (books[2], horror)],
+        [(sf, "sf"), (space, "space"), (horror, "horror")],
+    )
+    index.ready = True
+    index.lastPolledAt = time.monotonic()
+
+    return index, books
+
+
+def testTagIndexEvaluatesExpressions(tagIndex):
+    index, books = tagIndex
+
+    assert index.bookUids(index.evaluate(parseTagExpression("sf AND space"))) == [
+        books[1]
+    ]
+    assert index.bookUids(
+        index.evaluate(parseTagExpression("(sf OR horror) AND NOT space"))
+    ) == [books[0], books[2]]
+
+    index.apply({"op": "link", "book": str(books[3]), "tags": {str(uuid.uuid4()): "new"}})
+    index.apply({"op": "drop", "book": str(books[0])})
+
+    assert index.bookUids(index.evaluate(parseTagExpression("sf OR new"))) == [
+        books[1],
+        books[3],
+    ]
+
+
+def testSparseTagStaysSmall():
+    books = [uuid.uuid4() for _ in range(200000)]
+    common, rare = uuid.uuid4(), uuid.uuid4()
+
+    index = TagBitmapIndex()
+    index.rebuild([(book, common) for book in books], [(common, "common")])
+    index.link(books[-1], {rare: "rare"})
+
+    # one recent book must not cost a bit for every book in the index
+    assert len(index._tags[rare].serialize()) < 64
+    assert len(index._tags[common].serialize()) < 1024
+
+
+def testTagIndexFilterForm(tagIndex):
+    index, books = tagIndex
+
+    positive = index.filter(parseTagExpression("sf"))
+    negative = index.filter(parseTagExpression("NOT horror"))
+
+    # books carrying none of the tags match NOT, so the tagged books that
+    # fail the expression are excluded instead
+    assert "ANY" in str(positive.compile())
+    assert positive.right.element.value == [books[0], books[1]]
+    assert "ALL" in str(negative.compile())
+    assert negative.right.element.value == [books[2]]
+
+
+def testColdTagIndexFallsBackToSql(tagIndex):
+    index, _ = tagIndex
+    index.ready = False
+
+    assert "EXISTS" in str(index.filter(parseTagExpression("sf AND NOT space")))